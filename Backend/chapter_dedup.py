@@ -0,0 +1,84 @@
+import re
+
+class ChapterDeduplicator:
+    """
+    查找重复章节（连续重复粘贴，或换了标题后重新发布的章节）。
+    每个章节按句子切分成片段，把片段的哈希作为指纹，只保留最小的若干个哈希（bottom-k MinHash），
+    借助哈希倒排索引找出候选章节，再用两者的指纹估算相似度，整体耗时与全文长度成线性关系。
+    """
+    CHAPTER_HEADING_PATTERN = re.compile(r'第[0-9０-９零〇一二两三四五六七八九十百千万]+[章节回]')
+    # 以句末标点切分出的、至少8个字符的片段；切分和匹配都在re模块内完成
+    SHINGLE_PATTERN = re.compile(r'[^。！？!?]{8,}')
+    SKETCH_SIZE = 32
+    MIN_SHINGLES = 5 # 片段过少的章节（例如只有标题）不参与判断
+    SIMILARITY_THRESHOLD = 0.8
+    TITLE_MAX_LENGTH = 30
+
+    def find_duplicates(self, content):
+        """
+        返回 (跳过区间列表, 报告列表)。
+        跳过区间为按起点排序的 (起始字符索引, 结束字符索引)；
+        报告中每一项为 {"title", "start", "end", "duplicate_of"}，duplicate_of为原章节标题。
+        """
+        chapter_starts = [match.start() for match in self.CHAPTER_HEADING_PATTERN.finditer(content)]
+        if not chapter_starts:
+            return [], []
+        if chapter_starts[0] != 0:
+            chapter_starts.insert(0, 0) # 第一章之前的内容（简介等）同样作为一个章节参与比较
+        chapter_ends = chapter_starts[1:] + [len(content)]
+
+        sketches = [] # 保留下来的章节的 (指纹, 标题)
+        sketch_index = {} # 哈希 -> 包含该哈希的保留章节序号列表
+        skip_ranges = []
+        report = []
+        for start, end in zip(chapter_starts, chapter_ends):
+            chapter = content[start:end]
+            shingles = set(self.SHINGLE_PATTERN.findall(chapter))
+            if len(shingles) < self.MIN_SHINGLES:
+                continue
+            sketch = sorted(map(hash, shingles))[:self.SKETCH_SIZE]
+            title = self._chapter_title(chapter)
+
+            original_id = self._find_similar_chapter(sketch, sketches, sketch_index)
+            if original_id is not None:
+                if skip_ranges and skip_ranges[-1][1] == start:
+                    skip_ranges[-1] = (skip_ranges[-1][0], end) # 合并相邻的重复章节
+                else:
+                    skip_ranges.append((start, end))
+                report.append({
+                    "title": title,
+                    "start": start,
+                    "end": end,
+                    "duplicate_of": sketches[original_id][1],
+                })
+                continue
+
+            chapter_id = len(sketches)
+            sketches.append((sketch, title))
+            for value in sketch:
+                sketch_index.setdefault(value, []).append(chapter_id)
+        return skip_ranges, report
+
+    def _find_similar_chapter(self, sketch, sketches, sketch_index):
+        hit_counts = {}
+        for value in sketch:
+            for chapter_id in sketch_index.get(value, ()):
+                hit_counts[chapter_id] = hit_counts.get(chapter_id, 0) + 1
+        # 命中次数最多的几个候选足以覆盖真正的重复章节
+        candidates = sorted(hit_counts, key=hit_counts.get, reverse=True)[:3]
+        for chapter_id in candidates:
+            if self._estimate_similarity(sketch, sketches[chapter_id][0]) >= self.SIMILARITY_THRESHOLD:
+                return chapter_id
+        return None
+
+    def _estimate_similarity(self, sketch_a, sketch_b):
+        """用两个bottom-k指纹估算片段集合的Jaccard相似度。"""
+        set_a = set(sketch_a)
+        set_b = set(sketch_b)
+        union_sketch = sorted(set_a | set_b)[:self.SKETCH_SIZE]
+        shared = sum(1 for value in union_sketch if value in set_a and value in set_b)
+        return shared / len(union_sketch)
+
+    def _chapter_title(self, chapter):
+        title = chapter[:self.TITLE_MAX_LENGTH].split('    ')[0].strip()
+        return title or chapter[:self.TITLE_MAX_LENGTH].strip()
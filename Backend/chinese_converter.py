@@ -0,0 +1,140 @@
+import os
+import re
+from collections import OrderedDict
+
+try:
+    import opencc
+except ImportError: # 未安装时不提供简繁转换
+    opencc = None
+
+class ChineseConverter:
+    """
+    简繁转换器，词典数据来自opencc包自带的OpenCC词典文件。
+    按"先词组、后单字"的顺序做最长匹配：以词组首字索引每个首字对应的最长词组长度，相当于一棵压平的前缀树；
+    不在任何词组中的文字直接用str.translate按单字表转换。
+    只保留转换前后长度相同的词条，转换结果与原文逐字对齐，字符索引和阅读进度不受影响。
+    """
+    DIRECTIONS = {
+        "t2s": ("TSPhrases.txt", "TSCharacters.txt"), # 繁体转简体
+        "s2t": ("STPhrases.txt", "STCharacters.txt"), # 简体转繁体
+    }
+
+    def __init__(self, direction, dictionary_dir):
+        self.direction = direction
+        phrases_filename, characters_filename = self.DIRECTIONS[direction]
+        self._char_table = {
+            ord(source): target
+            for source, target in self._read_dictionary(os.path.join(dictionary_dir, characters_filename))
+            if len(source) == 1 and len(target) == 1 and source != target
+        }
+        self._phrases = {}
+        self._max_phrase_length = {} # 词组首字 -> 以该字开头的最长词组长度
+        for source, target in self._read_dictionary(os.path.join(dictionary_dir, phrases_filename)):
+            if len(source) < 2 or len(source) != len(target):
+                continue
+            self._phrases[source] = target
+            first_char = source[0]
+            self._max_phrase_length[first_char] = max(self._max_phrase_length.get(first_char, 0), len(source))
+        if self._max_phrase_length:
+            first_chars = "".join(re.escape(char) for char in sorted(self._max_phrase_length))
+            self._phrase_start_pattern = re.compile(f"[{first_chars}]")
+        else:
+            self._phrase_start_pattern = None
+        self.max_phrase_length = max(self._max_phrase_length.values(), default=0)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """按配置创建转换器；未启用转换或缺少词典时返回None。"""
+        direction = settings.get("chinese_conversion", "")
+        if direction not in cls.DIRECTIONS or opencc is None:
+            return None
+        dictionary_dir = os.path.join(os.path.dirname(opencc.__file__), "dictionary")
+        try:
+            return cls(direction, dictionary_dir)
+        except OSError:
+            return None
+
+    def _read_dictionary(self, path):
+        """读取OpenCC词典，每行为"原文<Tab>候选1 候选2 ..."，只取第一个候选。"""
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                source, _, targets = line.rstrip('\n').partition('\t')
+                if source and targets:
+                    entries.append((source, targets.split(' ')[0]))
+        return entries
+
+    def convert(self, text):
+        if self._phrase_start_pattern is None:
+            return text.translate(self._char_table)
+        pieces = []
+        last_end = 0
+        for match in self._phrase_start_pattern.finditer(text):
+            pos = match.start()
+            if pos < last_end:
+                continue
+            max_length = min(self._max_phrase_length[match.group()], len(text) - pos)
+            for length in range(max_length, 1, -1):
+                replacement = self._phrases.get(text[pos:pos + length])
+                if replacement is not None:
+                    pieces.append(text[last_end:pos].translate(self._char_table))
+                    pieces.append(replacement)
+                    last_end = pos + length
+                    break
+        pieces.append(text[last_end:].translate(self._char_table))
+        return "".join(pieces)
+
+    def convert_slice(self, text, start, end):
+        """
+        转换text[start:end]。两侧各多取最长词组长度的上下文一起转换再截回，
+        跨越切片边界（换页、换行）的词组仍按词组转换，与转换全文的结果一致。
+        """
+        context_start = max(start - self.max_phrase_length, 0)
+        context_end = min(end + self.max_phrase_length, len(text))
+        converted = self.convert(text[context_start:context_end])
+        return converted[start - context_start : end - context_start]
+
+class PageConversionCache:
+    """
+    位于内容和显示之间的惰性转换层：只转换可见页和预取页，结果保存在有界LRU中。
+    如果已有整本书的转换结果（逐字对齐），则直接按字符索引切片。
+    """
+    MAX_PAGES = 64
+
+    def __init__(self, converter):
+        self.converter = converter
+        self.converted_book = None
+        self._pages = OrderedDict()
+
+    def attach_book(self, novel_handler, book_sha256, content, persist):
+        """
+        读取整本书的转换结果并启用；没有现成结果且persist为True时，转换全文并保存到磁盘缓存。
+        耗时与书的大小成正比，应在后台线程中调用。
+        """
+        direction = self.converter.direction
+        converted_book = novel_handler.read_converted_book(book_sha256, direction, len(content))
+        if converted_book is None and persist:
+            converted_book = self.converter.convert(content)
+            novel_handler.write_converted_book(book_sha256, direction, converted_book)
+        if converted_book is not None:
+            # 只做一次赋值，主线程随时读取都能得到完整的结果
+            self.converted_book = converted_book
+
+    def __call__(self, start_index, raw_text, content, local_index):
+        """
+        转换从字符索引start_index开始的raw_text；raw_text是content从local_index开始的一段，
+        content提供前后文，使跨越页面边界的词组也能正确转换。
+        """
+        if self.converted_book is not None:
+            return self.converted_book[start_index:start_index + len(raw_text)]
+        # 快速恢复的片段换成全文后前后文可能不同，content长度也参与缓存键
+        key = (start_index, raw_text, len(content))
+        converted = self._pages.get(key)
+        if converted is not None:
+            self._pages.move_to_end(key)
+            return converted
+        converted = self.converter.convert_slice(content, local_index, local_index + len(raw_text))
+        self._pages[key] = converted
+        if len(self._pages) > self.MAX_PAGES:
+            self._pages.popitem(last=False)
+        return converted
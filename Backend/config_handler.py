@@ -12,21 +12,26 @@ class ConfigHandler:
         开发环境使用项目根目录下的resources/config.json；
         打包后的应用使用当前用户的本地应用数据目录。
         """
+        self.config_path = self.resolve_config_path(config_dir, config_filename)
+
+        # 确保配置目录存在，日志等运行时文件也放在该目录下
+        self.config_dir = os.path.dirname(self.config_path)
+        os.makedirs(self.config_dir, exist_ok=True)
+        self.temp_config_path = f"{self.config_path}.tmp"
+        self._remove_stale_temp_file()
+
+    @staticmethod
+    def resolve_config_path(config_dir="resources", config_filename="config.json"):
+        """配置文件的路径；只计算路径，不创建目录，也不清理临时文件。"""
         if getattr(sys, 'frozen', False):
             local_app_data = os.getenv("LOCALAPPDATA")
             if local_app_data:
                 config_root = os.path.join(local_app_data, "ReadInTheOffice")
             else:
                 config_root = os.path.join(os.path.expanduser("~"), ".ReadInTheOffice")
-            self.config_path = os.path.join(config_root, config_filename)
-        else:
-            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-            self.config_path = os.path.join(project_root, config_dir, config_filename)
-
-        # 确保配置目录存在
-        os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-        self.temp_config_path = f"{self.config_path}.tmp"
-        self._remove_stale_temp_file()
+            return os.path.join(config_root, config_filename)
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        return os.path.join(project_root, config_dir, config_filename)
 
     def _remove_stale_temp_file(self):
         """移除上次异常中断时未替换成功的临时配置文件。"""
@@ -49,6 +54,17 @@ class ConfigHandler:
             "minimize_hotkey": "<ctrl>+m",
             "close_hotkey": "<alt>+q",
             "paging_hotkey": "← 和 →",
+            "stall_watchdog": False, # 是否启用主线程卡顿监测
+            "stall_threshold_ms": 50,
+            "content_filter": {"literals": [], "regexes": []}, # 加载小说时删除的屏蔽字符串和正则表达式
+            "dedup_chapters": False, # 是否在翻页时跳过重复章节
+            "chinese_conversion": "", # 简繁转换方向："" 不转换，"t2s" 繁转简，"s2t" 简转繁
+            "persist_chinese_conversion": False, # 是否在后台转换整本书并保存到缓存
+            "auto_scroll_lines_per_minute": 30, # 自动滚动速度（空格键开始/停止）
+            "auto_scroll_smooth": True, # True为逐像素平滑滚动，False为逐行滚动
+            "auto_fit": False, # 是否按图层的像素尺寸和字体的实际宽度排版
+            "overlay_width": 600, # 自动排版时图层的宽度和高度（像素）
+            "overlay_height": 300,
             "progress": {} # 用于存储每本书的阅读进度
         }
 
@@ -81,6 +97,29 @@ class ConfigHandler:
             self.save_settings(default_settings)
             return default_settings
 
+    def merge_newer_progress(self, settings):
+        """
+        把配置文件中比settings更新（last_read更晚）的阅读进度合并到settings中。
+        图形界面和终端阅读器可能同时运行，保存前先合并，避免覆盖对方刚刚保存的进度。
+        """
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                saved_progress = json.load(f).get("progress")
+        except (OSError, ValueError, AttributeError):
+            return
+        if not isinstance(saved_progress, dict):
+            return
+        progress = settings.setdefault("progress", {})
+        for book_name, saved_entry in saved_progress.items():
+            if self._last_read(saved_entry) > self._last_read(progress.get(book_name)):
+                progress[book_name] = saved_entry
+
+    def _last_read(self, progress_entry):
+        # 旧版只保存字符索引的进度没有时间，视为最早
+        if isinstance(progress_entry, dict):
+            return str(progress_entry.get("last_read", ""))
+        return ""
+
     def save_settings(self, settings):
         """
         将给定设置保存到config.json文件。
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import re
+from collections import Counter
+
+class LiteralMatcher:
+    """
+    在一次扫描中查找多个字面字符串。
+    每个字符串以其中在正文里最少见的字符作为锚点，所有锚点组成正则开头的字符集，
+    re引擎以C的速度跳过不含锚点的位置；到达锚点后，由字符集回顾断言组成、按出现频率分组的判定树
+    只需几次判断就能确定是哪个锚点，再用前瞻、回顾断言校验整个字符串。
+    Python代码只处理真正的匹配，耗时基本不随字符串数量增长。
+    """
+    FAN_OUT = 4 # 判定树每个节点的分支数
+    SAMPLE_SIZE = 16384 # 统计字符频率时的抽样字符数
+
+    def __init__(self, literals):
+        self.literals = literals
+        # (正则, 锚点字符 -> [(锚点在字符串中的位置, 字符串)])，整体赋值，供多个线程同时读取
+        self._compiled = None
+
+    def prepare(self, sample_text):
+        """用一段正文样本的字符频率选择锚点；只有第一次调用有效，选择结果只影响速度，不影响匹配结果。"""
+        if self._compiled is not None:
+            return
+        frequency = Counter(sample_text[::max(len(sample_text) // self.SAMPLE_SIZE, 1)])
+        anchored = {}
+        for literal in self.literals:
+            offset = min(range(len(literal)), key=lambda index: frequency[literal[index]])
+            anchored.setdefault(literal[offset], []).append((offset, literal))
+        # 常见的锚点排在前面，判定树中到达它们所需的判断最少
+        anchors = sorted(anchored, key=lambda char: (-frequency[char], char))
+        weights = {char: frequency[char] + 1 for char in anchors}
+        tree_pattern = self._tree_pattern(anchors, weights, anchored)
+        self._compiled = (re.compile(f"{self._char_class(anchors)}(?:{tree_pattern})"), anchored)
+
+    def find_spans(self, text):
+        """返回text中所有匹配（包括相互重叠的匹配）的 (起点, 终点) 列表。"""
+        if self._compiled is None:
+            self.prepare(text)
+        pattern, anchored = self._compiled
+        spans = []
+        for match in pattern.finditer(text):
+            anchor_index = match.start()
+            # 正则只保证至少有一个字符串匹配，同一锚点的其他字符串在这里逐个检查
+            for offset, literal in anchored[text[anchor_index]]:
+                start = anchor_index - offset
+                if start >= 0 and text.startswith(literal, start):
+                    spans.append((start, start + len(literal)))
+        return spans
+
+    def _char_class(self, chars):
+        return f"[{''.join(re.escape(char) for char in chars)}]"
+
+    def _tree_pattern(self, anchors, weights, anchored):
+        """已经消耗了锚点字符之后的判定树；按出现频率把锚点分成总频率大致相等的几组。"""
+        if len(anchors) <= self.FAN_OUT:
+            return "|".join(self._leaf_pattern(anchor, anchored[anchor]) for anchor in anchors)
+        total_weight = sum(weights[anchor] for anchor in anchors)
+        groups = [[]]
+        accumulated_weight = 0
+        for anchor in anchors:
+            if groups[-1] and accumulated_weight >= total_weight * len(groups) / self.FAN_OUT:
+                groups.append([])
+            groups[-1].append(anchor)
+            accumulated_weight += weights[anchor]
+        return "|".join(
+            self._leaf_pattern(group[0], anchored[group[0]]) if len(group) == 1
+            else f"(?<={self._char_class(group)})(?:{self._tree_pattern(group, weights, anchored)})"
+            for group in groups
+        )
+
+    def _leaf_pattern(self, anchor, entries):
+        alternatives = []
+        for offset, literal in sorted(entries, key=lambda entry: -len(entry[1])):
+            alternative = ""
+            if offset + 1 < len(literal):
+                alternative += f"(?={re.escape(literal[offset + 1:])})"
+            if offset > 0:
+                alternative += f"(?<={re.escape(literal[:offset + 1])})"
+            if not alternative:
+                # 字符串只有锚点一个字符，锚点本身就是匹配
+                return f"(?<={re.escape(anchor)})"
+            alternatives.append(alternative)
+        return f"(?<={re.escape(anchor)})(?:{'|'.join(alternatives)})"
+
+class ContentFilter:
+    """
+    小说内容过滤器，删除屏蔽列表中的字面字符串和正则表达式所匹配的内容（广告行、水印网址等）。
+    字面字符串由LiteralMatcher在去掉换行符的文本上查找，被硬换行拆开的字符串同样能找到，
+    但不会跨越段落分隔（连续的换行符，与NovelHandler._normalize_text的段落规则一致）；
+    正则表达式各自单独编译、逐个在原文上查找，分组名和反向引用互不影响。
+    删除后只剩空白的行连同行尾的换行符一起删除，不会留下被当成段落分隔的空行。
+    匹配只在一次apply的文本内进行，分段处理时由调用方保证没有匹配跨越分段的边界（见changes_between）。
+    """
+    VERSION = 3 # 删除规则的版本，参与过滤规则哈希；规则改变后旧的过滤结果缓存随之失效
+    BLANK_CHARS = " \t\r\f　"
+    PARAGRAPH_BREAKS = ("\n\n", "\r\r", "\r\n\r\n")
+
+    def __init__(self, literals=(), regexes=()):
+        self.literals = sorted({
+            literal.replace('\r', '').replace('\n', '')
+            for literal in literals if isinstance(literal, str)
+        } - {""})
+        self.regexes = []
+        self._compiled_regexes = []
+        for pattern in regexes:
+            if not isinstance(pattern, str) or not pattern or pattern in self.regexes:
+                continue
+            try:
+                compiled_regex = re.compile(pattern, re.MULTILINE)
+            except re.error:
+                # 无效的正则直接忽略
+                continue
+            self.regexes.append(pattern)
+            self._compiled_regexes.append(compiled_regex)
+        self._literal_matcher = LiteralMatcher(self.literals) if self.literals else None
+        self.max_literal_length = max(map(len, self.literals), default=0)
+
+        if self.is_empty():
+            self.filter_hash = ""
+            return
+        filter_set = json.dumps(
+            {"version": self.VERSION, "literals": self.literals, "regexes": self.regexes}, ensure_ascii=False
+        )
+        self.filter_hash = hashlib.sha256(filter_set.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def from_settings(cls, settings):
+        filter_settings = settings.get("content_filter")
+        if not isinstance(filter_settings, dict):
+            return cls()
+        literals = filter_settings.get("literals")
+        regexes = filter_settings.get("regexes")
+        return cls(
+            literals if isinstance(literals, list) else (),
+            regexes if isinstance(regexes, list) else (),
+        )
+
+    def is_empty(self):
+        return not self.literals and not self.regexes
+
+    def prepare(self, sample_text):
+        """用正文样本为字面字符串选择锚点，应在过滤一本书之前调用。"""
+        if self._literal_matcher is not None:
+            self._literal_matcher.prepare(sample_text)
+
+    def apply(self, text):
+        """删除text中所有匹配的内容。"""
+        if self.is_empty():
+            return text
+        spans = self._find_spans(text)
+        if not spans:
+            return text
+        return "".join(text[start:end] for start, end in self._kept_ranges(text, spans))
+
+    def kept_ranges(self, text):
+        """过滤text后保留下来的各段内容在text中的 (起点, 终点) 列表，按顺序拼接即为apply的结果。"""
+        spans = self._find_spans(text) if not self.is_empty() else []
+        if not spans:
+            return [(0, len(text))]
+        return self._kept_ranges(text, spans)
+
+    def changes_between(self, text, start, end):
+        """过滤text时是否会改动[start, end)之间的内容。"""
+        return any(span_end > start and span_start < end for span_start, span_end in self._find_spans(text))
+
+    def _find_spans(self, text):
+        spans = []
+        if self._literal_matcher is not None:
+            spans.extend(self._find_literal_spans(text))
+        for compiled_regex in self._compiled_regexes:
+            spans.extend(match.span() for match in compiled_regex.finditer(text) if match.end() > match.start())
+        return spans
+
+    def _find_literal_spans(self, text):
+        joined_text = text.replace('\r', '').replace('\n', '')
+        joined_spans = self._literal_matcher.find_spans(joined_text)
+        if not joined_spans or len(joined_text) == len(text):
+            return joined_spans
+        # 把去掉换行符之后的位置按从小到大的顺序映射回原文，用str.count统计途中经过的换行符
+        positions = sorted({position for start, end in joined_spans for position in (start, end - 1)})
+        original_positions = {}
+        original_index = self._skip_line_breaks(text, 0)
+        joined_index = 0
+        for position in positions:
+            while joined_index < position:
+                step = position - joined_index
+                line_breaks = text.count('\n', original_index, original_index + step) + text.count(
+                    '\r', original_index, original_index + step
+                )
+                original_index = self._skip_line_breaks(text, original_index + step)
+                joined_index += step - line_breaks
+            original_positions[position] = original_index
+        spans = []
+        for start, end in joined_spans:
+            original_start = original_positions[start]
+            original_end = original_positions[end - 1] + 1
+            # 匹配的首尾都不是换行符，中间的换行符都是完整的一组；其中有段落分隔的匹配跨越了两个段落
+            if (original_end - original_start > end - start + 1
+                    and any(text.find(paragraph_break, original_start, original_end) != -1
+                            for paragraph_break in self.PARAGRAPH_BREAKS)):
+                continue
+            spans.append((original_start, original_end))
+        return spans
+
+    def _skip_line_breaks(self, text, index):
+        while index < len(text) and text[index] in '\r\n':
+            index += 1
+        return index
+
+    def _kept_ranges(self, text, spans):
+        spans.sort()
+        kept_ranges = []
+        last_end = 0
+        index = 0
+        while index < len(spans):
+            # 把落在同一行（或被匹配连接起来的几行）内的匹配归为一组，并合并相互重叠的匹配
+            line_start = text.rfind('\n', 0, spans[index][0]) + 1
+            line_end = -1
+            merged_spans = []
+            while index < len(spans) and (line_end == -1 or spans[index][0] <= line_end):
+                start, end = spans[index]
+                if merged_spans and start <= merged_spans[-1][1]:
+                    merged_spans[-1] = (merged_spans[-1][0], max(merged_spans[-1][1], end))
+                else:
+                    merged_spans.append((start, end))
+                line_end = max(line_end, self._line_end(text, merged_spans[-1][1]))
+                index += 1
+
+            remaining_pieces = [text[line_start:merged_spans[0][0]], text[merged_spans[-1][1]:line_end]]
+            remaining_pieces.extend(
+                text[previous_end:next_start]
+                for (_, previous_end), (next_start, _) in zip(merged_spans, merged_spans[1:])
+            )
+            if all(not piece.strip(self.BLANK_CHARS) for piece in remaining_pieces):
+                # 整行都是屏蔽内容，连同行尾的换行符一起删除
+                kept_ranges.append((last_end, line_start))
+                last_end = min(line_end + 1, len(text))
+            else:
+                for start, end in merged_spans:
+                    kept_ranges.append((last_end, start))
+                    last_end = end
+        kept_ranges.append((last_end, len(text)))
+        return [(start, end) for start, end in kept_ranges if end > start]
+
+    def _line_end(self, text, span_end):
+        """匹配的最后一个字符所在行的换行符位置，没有换行符时为文本末尾。"""
+        line_end = text.find('\n', span_end - 1)
+        return len(text) if line_end == -1 else line_end
@@ -1,14 +1,24 @@
+import bisect
 import hashlib
+import json
 import os
 import re
 import chardet
 import sys
 
+from Backend.content_filter import ContentFilter
+
 class NovelHandler:
     """
     负责处理小说文件，核心功能是解码并返回完整的字符串内容。
     """
-    def __init__(self, books_dir_name="books"):
+    CHECKPOINT_INTERVAL_BYTES = 64 * 1024 # 相邻两个恢复检查点之间的最小字节距离
+    RESUME_WINDOW_BYTES = 256 * 1024 # 快速恢复时读取的字节数
+    MAX_CACHED_BOOKS = 8 # 磁盘上最多保留的过滤结果缓存数量
+    # 与_normalize_text两条规则等价的单次匹配：前四种替换为4个空格，最后一种删除
+    WHITESPACE_PATTERN = re.compile(r'(\r\n){2,}|\r{2,}|\n{2,}|\f|[\n\r\t　]')
+
+    def __init__(self, books_dir_name="books", cache_dir=None):
         if getattr(sys, 'frozen', False):
             # 如果是打包后的exe，使用exe所在的目录作为项目根目录
             project_root = os.path.dirname(sys.executable)
@@ -17,6 +27,13 @@ class NovelHandler:
             project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
         self.books_dir = os.path.join(project_root, books_dir_name)
         os.makedirs(self.books_dir, exist_ok=True)
+        # 过滤后的内容按(SHA-256, 过滤规则哈希)缓存在该目录；为None时不使用磁盘缓存
+        self.cache_dir = cache_dir
+        self.content_filter = ContentFilter()
+        # 最近一次加载结果的缓存：(键, 结果, 检查点)，键为(文件名, 文件大小, 修改时间, 过滤规则哈希)
+        self._last_load = (None, None, None)
+        # 最近一次计算的分段行首表：((加载键, 分段起始字节偏移), 行首表)
+        self._last_line_table = (None, None)
 
     def get_all_books_names(self):
         try:
@@ -37,29 +54,423 @@ class NovelHandler:
         except (FileNotFoundError, IndexError):
             return 'utf-8'
 
+    def set_content_filter(self, content_filter):
+        """设置内容过滤器；过滤规则变化后，之前的加载结果不再有效。"""
+        self.content_filter = content_filter
+        self._last_load = (None, None, None)
+
+    def _normalize_text(self, text):
+        """根据精确的规则处理空白字符。"""
+        # 替换规则
+        # 1. 高优先级：将作为段落分隔的连续换行符/回车符或换页符，替换为4个空格
+        processed_content = re.sub(r'(\r\n){2,}|\r{2,}|\n{2,}|\f', '    ', text)
+        # 2. 低优先级：移除剩余的、单个的、破坏排版的换行、回车、制表符和全角空格
+        return re.sub(r'[\n\r\t　]', '', processed_content)
+
+    def _supports_checkpoints(self, encoding):
+        """换行符必须是独立的单字节，才能在换行处安全地切分字节流。"""
+        try:
+            return '\n'.encode(encoding) == b'\n'
+        except LookupError:
+            return False
+
+    def _find_safe_boundary(self, raw_content, start, encoding):
+        """
+        从start开始查找第一个安全切分点：紧跟在换行符之后、且下一个字符不是换行符或回车符的位置，
+        并且内容过滤器不会改动切分点所在的行（见_is_filter_safe_boundary）。
+        在这里切分时，解码器没有跨越切分点的状态，连续换行符的替换规则也不会跨越切分点；
+        换页符、制表符和全角空格都是逐个字符替换或删除的，行首的缩进（例如"　　"）不影响切分，
+        因此分段处理再拼接的结果与整体处理完全一致。找不到时返回-1。
+        """
+        pos = raw_content.find(b'\n', start)
+        while pos != -1:
+            boundary = pos + 1
+            if boundary >= len(raw_content):
+                return -1
+            if raw_content[boundary:boundary + 1] not in (b'\n', b'\r'):
+                if self.content_filter.is_empty():
+                    return boundary
+                safe = self._is_filter_safe_boundary(raw_content, boundary, encoding)
+                if safe is None:
+                    return -1
+                if safe:
+                    return boundary
+            pos = raw_content.find(b'\n', boundary)
+        return -1
+
+    def _is_filter_safe_boundary(self, raw_content, boundary, encoding):
+        """
+        过滤器是否不会改动切分点所在的行：行首的内容被删除、整行被删除，或者匹配从前面的行延续过来、
+        向后面的行延续下去，都会使分段过滤的结果与整体过滤不同。
+        检查范围是切分点前后各一个最长字面字符串的长度（向前最多回溯一个检查点间隔），再扩展到整行，
+        这些字节一定在上一个切分点之后，从任意切分点开始查找都会得到相同的结果；
+        跨越更大范围的正则匹配不保证能在切分点处找到。
+        无法判断（检查范围超出了已读取的字节）时返回None。
+        """
+        # 每个字符最多占4个字节，另加两行余量，覆盖硬换行把字符串拆开的情况
+        margin = self.content_filter.max_literal_length * 4 + 2
+        lookback_start = max(boundary - self.CHECKPOINT_INTERVAL_BYTES, 0)
+        lookback = max(boundary - 1 - margin, lookback_start)
+        window_start = max(raw_content.rfind(b'\n', lookback_start, lookback) + 1, lookback_start)
+        line_end = raw_content.find(b'\n', boundary)
+        if line_end == -1:
+            # 无法确定这一行在完整文件中是否还有后续内容
+            return None
+        window_end = raw_content.find(b'\n', max(line_end + margin, line_end + 1))
+        if window_end == -1:
+            return None
+        before = raw_content[window_start:boundary].decode(encoding, errors='ignore')
+        boundary_line = raw_content[boundary:line_end + 1].decode(encoding, errors='ignore')
+        after = raw_content[line_end + 1:window_end + 1].decode(encoding, errors='ignore')
+        return not self.content_filter.changes_between(
+            before + boundary_line + after, len(before), len(before) + len(boundary_line)
+        )
+
+    def _find_segment_boundaries(self, raw_content, encoding):
+        """
+        返回各分段的起始字节偏移。每个切分点都从上一个切分点向后至少跳过CHECKPOINT_INTERVAL_BYTES，
+        因此从任意一个切分点开始的一段字节，会得到与全文完全相同的后续切分点。
+        """
+        byte_offsets = [0]
+        # 用开头的一段正文为过滤器统计字符频率
+        self.content_filter.prepare(raw_content[:self.CHECKPOINT_INTERVAL_BYTES].decode(encoding, errors='ignore'))
+        if self._supports_checkpoints(encoding):
+            boundary = self._find_safe_boundary(raw_content, self.CHECKPOINT_INTERVAL_BYTES, encoding)
+            while boundary != -1:
+                byte_offsets.append(boundary)
+                boundary = self._find_safe_boundary(
+                    raw_content, boundary + self.CHECKPOINT_INTERVAL_BYTES, encoding
+                )
+        return byte_offsets
+
+    def _process_segments(self, raw_content, encoding, byte_offsets, content_end):
+        """
+        逐段解码、过滤并处理空白字符，单次流式扫描完成整个处理流程。
+        返回 (内容字符串, 各分段起始的字符偏移列表)。
+        """
+        pieces = []
+        char_offsets = []
+        char_offset = 0
+        segment_ends = byte_offsets[1:] + [content_end]
+        for segment_start, segment_end in zip(byte_offsets, segment_ends):
+            char_offsets.append(char_offset)
+            text = raw_content[segment_start:segment_end].decode(encoding, errors='ignore')
+            piece = self._normalize_text(self.content_filter.apply(text))
+            pieces.append(piece)
+            char_offset += len(piece)
+        return "".join(pieces), char_offsets
+
+    def has_cached_book(self, book_filename):
+        """这本书的上次加载结果是否仍然有效（文件和过滤规则均未改变）。"""
+        try:
+            stat = os.stat(os.path.join(self.books_dir, book_filename))
+        except OSError:
+            return False
+        load_key = (book_filename, stat.st_size, stat.st_mtime_ns, self.content_filter.filter_hash)
+        return self._last_load[0] == load_key
+
     def load_book_with_metadata(self, book_filename):
         """
         检测文件编码，将整个文件解码成字符串，并计算原始文件的SHA-256。
-        根据精确的规则处理空白字符。
+        按内容过滤器删除屏蔽内容，并根据精确的规则处理空白字符。
         返回 (内容字符串, SHA-256, 错误信息) 的元组。
         """
         book_path = os.path.join(self.books_dir, book_filename)
         if not os.path.exists(book_path):
             return None, None, f"错误：找不到文件 {book_filename}"
 
-        encoding = self._detect_encoding(book_path)
+        try:
+            stat = os.stat(book_path)
+        except OSError as e:
+            return None, None, f"打开或读取文件时出错: {e}"
+        content_filter = self.content_filter
+        load_key = (book_filename, stat.st_size, stat.st_mtime_ns, content_filter.filter_hash)
+        last_load = self._last_load
+        if load_key == last_load[0]:
+            # 重新打开同一本未修改的书时，直接复用上次的解码结果
+            return last_load[1]
 
         try:
             with open(book_path, 'rb') as f:
                 raw_content = f.read()
+            book_sha256 = hashlib.sha256(raw_content).hexdigest()
 
-            content = raw_content.decode(encoding, errors='ignore')
-            # 替换规则
-            # 1. 高优先级：将作为段落分隔的连续换行符/回车符或换页符，替换为4个空格
-            processed_content = re.sub(r'(\r\n){2,}|\r{2,}|\n{2,}|\f', '    ', content)
-            # 2. 低优先级：移除剩余的、单个的、破坏排版的换行、回车、制表符和全角空格
-            processed_content = re.sub(r'[\n\r\t　]', '', processed_content)
+            cached = self._read_filtered_cache(book_sha256, content_filter)
+            if cached is not None:
+                processed_content, checkpoints = cached
+            else:
+                encoding = self._detect_encoding(book_path)
+                byte_offsets = self._find_segment_boundaries(raw_content, encoding)
+                processed_content, char_offsets = self._process_segments(
+                    raw_content, encoding, byte_offsets, len(raw_content)
+                )
+                checkpoints = (encoding, byte_offsets, char_offsets)
+                self._write_filtered_cache(book_sha256, content_filter, processed_content, checkpoints)
 
-            return processed_content, hashlib.sha256(raw_content).hexdigest(), None
+            result = (processed_content, book_sha256, None)
+            # 整体替换缓存，后台线程加载时主线程不会读到不一致的中间状态
+            self._last_load = (load_key, result, checkpoints)
+            return result
         except Exception as e:
             return None, None, f"打开或读取文件时出错: {e}"
+
+    def _filtered_cache_paths(self, book_sha256, content_filter):
+        base_path = os.path.join(self.cache_dir, f"{book_sha256}-{content_filter.filter_hash}")
+        return f"{base_path}.txt", f"{base_path}.json"
+
+    def _read_filtered_cache(self, book_sha256, content_filter):
+        """读取过滤结果缓存，返回 (内容字符串, 检查点)；只有启用了过滤规则时才使用缓存。"""
+        if self.cache_dir is None or content_filter.is_empty():
+            return None
+        content_path, checkpoints_path = self._filtered_cache_paths(book_sha256, content_filter)
+        try:
+            with open(checkpoints_path, 'r', encoding='utf-8') as f:
+                cached_checkpoints = json.load(f)
+            with open(content_path, 'r', encoding='utf-8', newline='') as f:
+                processed_content = f.read()
+            checkpoints = (
+                cached_checkpoints["encoding"],
+                cached_checkpoints["byte_offsets"],
+                cached_checkpoints["char_offsets"],
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if len(processed_content) != cached_checkpoints.get("content_length"):
+            return None
+        return processed_content, checkpoints
+
+    def _write_filtered_cache(self, book_sha256, content_filter, processed_content, checkpoints):
+        if self.cache_dir is None or content_filter.is_empty():
+            return
+        content_path, checkpoints_path = self._filtered_cache_paths(book_sha256, content_filter)
+        encoding, byte_offsets, char_offsets = checkpoints
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # 先写内容再写检查点，检查点文件存在即表示缓存完整
+            with open(f"{content_path}.tmp", 'w', encoding='utf-8', newline='') as f:
+                f.write(processed_content)
+            os.replace(f"{content_path}.tmp", content_path)
+            with open(f"{checkpoints_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump({
+                    "encoding": encoding,
+                    "byte_offsets": byte_offsets,
+                    "char_offsets": char_offsets,
+                    "content_length": len(processed_content),
+                }, f)
+            os.replace(f"{checkpoints_path}.tmp", checkpoints_path)
+            self._prune_cache('.json', ('.txt',))
+        except OSError:
+            # 缓存写入失败不影响阅读
+            pass
+
+    def _prune_cache(self, suffix, companion_suffixes=()):
+        """以suffix结尾的缓存文件只保留最近写入的MAX_CACHED_BOOKS份，同名的配套文件一并删除。"""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(suffix):
+                path = os.path.join(self.cache_dir, filename)
+                entries.append((os.path.getmtime(path), path[:-len(suffix)]))
+        entries.sort(reverse=True)
+        for _, base_path in entries[self.MAX_CACHED_BOOKS:]:
+            for path_suffix in (suffix, *companion_suffixes):
+                try:
+                    os.remove(f"{base_path}{path_suffix}")
+                except FileNotFoundError:
+                    pass
+
+    def _converted_book_path(self, book_sha256, direction):
+        return os.path.join(
+            self.cache_dir, f"{book_sha256}-{self.content_filter.filter_hash}.{direction}.txt"
+        )
+
+    def read_converted_book(self, book_sha256, direction, content_length):
+        """读取整本书的简繁转换结果，长度与当前内容不一致时视为无效。"""
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._converted_book_path(book_sha256, direction), 'r', encoding='utf-8', newline='') as f:
+                converted_content = f.read()
+        except (OSError, ValueError):
+            return None
+        return converted_content if len(converted_content) == content_length else None
+
+    def write_converted_book(self, book_sha256, direction, converted_content):
+        if self.cache_dir is None:
+            return
+        converted_path = self._converted_book_path(book_sha256, direction)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(f"{converted_path}.tmp", 'w', encoding='utf-8', newline='') as f:
+                f.write(converted_content)
+            os.replace(f"{converted_path}.tmp", converted_path)
+            self._prune_cache(f".{direction}.txt")
+        except OSError:
+            pass
+
+    def get_resume_snapshot(self, book_filename, char_index):
+        """
+        为阅读位置生成恢复快照：不超过char_index的最近一个检查点的字节偏移、字符偏移，
+        阅读位置所在行行首的原始字节偏移和字符索引（过滤规则变化后据此换算阅读位置），
+        以及编码、过滤规则哈希和文件的大小、修改时间。只能为最近一次完整加载的书生成，否则返回None。
+        """
+        load_key, _, checkpoints = self._last_load
+        if load_key is None or load_key[0] != book_filename:
+            return None
+        encoding, byte_offsets, char_offsets = checkpoints
+        position = max(bisect.bisect_right(char_offsets, char_index) - 1, 0)
+        snapshot = {
+            "byte_offset": byte_offsets[position],
+            "char_offset": char_offsets[position],
+            "encoding": encoding,
+            "filter_hash": load_key[3],
+            "file_size": load_key[1],
+            "mtime_ns": load_key[2],
+        }
+        line_table = self._segment_line_table(load_key, checkpoints, position)
+        if line_table is not None:
+            line_char_offsets, line_byte_offsets = line_table
+            line = max(bisect.bisect_right(line_char_offsets, char_index - char_offsets[position]) - 1, 0)
+            snapshot["line_byte_offset"] = byte_offsets[position] + line_byte_offsets[line]
+            snapshot["line_char_index"] = char_offsets[position] + line_char_offsets[line]
+        return snapshot
+
+    def remap_char_index(self, book_filename, snapshot, char_index):
+        """
+        过滤规则变化后，旧的字符索引不再对应相同的内容。行首的原始字节偏移与过滤规则无关：
+        按当前规则重新处理该字节偏移所在的分段，得到这一行行首在当前内容中的字符索引，
+        再加上阅读位置在行内的距离。无法换算（快照来自旧版本或后台加载期间、文件读取失败）时返回None；
+        没有快照时无从得知过滤规则是否变化，原样返回char_index。
+        """
+        if not isinstance(snapshot, dict):
+            return char_index
+        load_key, loaded_result, checkpoints = self._last_load
+        if load_key is None or load_key[0] != book_filename:
+            return None
+        if snapshot.get("filter_hash", "") == load_key[3]:
+            return char_index
+        _, byte_offsets, char_offsets = checkpoints
+        try:
+            line_byte_offset = int(snapshot["line_byte_offset"])
+            offset_in_line = char_index - int(snapshot["line_char_index"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if offset_in_line < 0 or not 0 <= line_byte_offset < load_key[1]:
+            return None
+        position = bisect.bisect_right(byte_offsets, line_byte_offset) - 1
+        line_table = self._segment_line_table(load_key, checkpoints, position)
+        if line_table is None:
+            return None
+        line_char_offsets, line_byte_offsets = line_table
+        line = bisect.bisect_left(line_byte_offsets, line_byte_offset - byte_offsets[position])
+        if line >= len(line_byte_offsets) or line_byte_offsets[line] != line_byte_offset - byte_offsets[position]:
+            return None
+        if line + 1 < len(line_char_offsets):
+            line_end = line_char_offsets[line + 1]
+        elif position + 1 < len(char_offsets):
+            line_end = char_offsets[position + 1] - char_offsets[position]
+        else:
+            line_end = len(loaded_result[0]) - char_offsets[position]
+        # 这一行在新规则下变短（部分内容被删除）时停在行尾
+        return char_offsets[position] + line_char_offsets[line] + min(offset_in_line, line_end - line_char_offsets[line])
+
+    def _segment_line_table(self, load_key, checkpoints, position):
+        """
+        按加载键和检查点加载的书中第position个分段的行首表：(各行行首处理后的字符偏移列表, 各行行首的字节偏移列表)，
+        均相对于分段开头。需要重新读取并处理这一分段，结果缓存到下一次查询其他分段为止；读取失败时返回None。
+        """
+        cache_key = (load_key, position)
+        cached_key, cached_table = self._last_line_table
+        if cached_key == cache_key:
+            return cached_table
+        encoding, byte_offsets, _ = checkpoints
+        segment_start = byte_offsets[position]
+        segment_end = byte_offsets[position + 1] if position + 1 < len(byte_offsets) else load_key[1]
+        try:
+            with open(os.path.join(self.books_dir, load_key[0]), 'rb') as f:
+                f.seek(segment_start)
+                raw_segment = f.read(segment_end - segment_start)
+        except OSError:
+            return None
+        line_table = self._line_table(raw_segment, encoding)
+        self._last_line_table = (cache_key, line_table)
+        return line_table
+
+    def _line_table(self, raw_segment, encoding):
+        """按_process_segments的处理规则（先过滤，再处理空白字符），计算分段内每一行行首处理后的字符偏移。"""
+        text = raw_segment.decode(encoding, errors='ignore')
+        byte_line_starts = [0] + [match.end() for match in re.finditer(b'\n', raw_segment)]
+        text_line_starts = [0] + [match.end() for match in re.finditer('\n', text)]
+        if len(byte_line_starts) != len(text_line_starts):
+            # 解码时丢弃了换行符，无法把行与字节偏移对应起来
+            return None
+
+        # 行首在过滤后文本中的位置；行首被删除时取删除区间之后第一个保留字符的位置
+        kept_ranges = self.content_filter.kept_ranges(text)
+        filtered_text = "".join(text[start:end] for start, end in kept_ranges)
+        filtered_line_starts = []
+        range_index = 0
+        kept_length = 0 # 当前保留区间之前保留的字符数
+        for line_start in text_line_starts:
+            while range_index < len(kept_ranges) and kept_ranges[range_index][1] <= line_start:
+                kept_length += kept_ranges[range_index][1] - kept_ranges[range_index][0]
+                range_index += 1
+            if range_index < len(kept_ranges) and kept_ranges[range_index][0] <= line_start:
+                filtered_line_starts.append(kept_length + line_start - kept_ranges[range_index][0])
+            else:
+                filtered_line_starts.append(kept_length)
+
+        # 再换算到空白字符处理之后；行首落在段落分隔中间时取替换后的4个空格之后
+        line_char_offsets = []
+        matches = self.WHITESPACE_PATTERN.finditer(filtered_text)
+        match = next(matches, None)
+        length_change = 0 # 已经过的匹配使文本缩短的字符数
+        for line_start in filtered_line_starts:
+            while match is not None and match.start() < line_start:
+                replacement_length = 4 if len(match.group()) > 1 or match.group() == '\f' else 0
+                if match.end() > line_start:
+                    break
+                length_change += match.end() - match.start() - replacement_length
+                match = next(matches, None)
+            if match is not None and match.start() < line_start:
+                line_char_offsets.append(match.start() - length_change + replacement_length)
+            else:
+                line_char_offsets.append(line_start - length_change)
+        return line_char_offsets, byte_line_starts
+
+    def load_resume_window(self, book_filename, snapshot):
+        """
+        根据恢复快照，只读取并处理快照位置附近的一小段内容，耗时与书的大小无关。
+        返回 (内容片段, 片段在全文中的起始字符索引)；快照无效、文件或过滤规则已变化时返回 (None, 0)。
+        """
+        if not isinstance(snapshot, dict):
+            return None, 0
+        if snapshot.get("filter_hash", "") != self.content_filter.filter_hash:
+            return None, 0
+        book_path = os.path.join(self.books_dir, book_filename)
+        try:
+            byte_offset = int(snapshot["byte_offset"])
+            char_offset = int(snapshot["char_offset"])
+            encoding = snapshot["encoding"]
+            stat = os.stat(book_path)
+            if (stat.st_size, stat.st_mtime_ns) != (snapshot["file_size"], snapshot["mtime_ns"]):
+                return None, 0
+            if not self._supports_checkpoints(encoding) or not 0 <= byte_offset < stat.st_size:
+                return None, 0
+            with open(book_path, 'rb') as f:
+                f.seek(byte_offset)
+                raw_window = f.read(self.RESUME_WINDOW_BYTES)
+        except (KeyError, TypeError, ValueError, OSError):
+            return None, 0
+
+        # 快照位于一个检查点上，从它开始切分得到的分段与全文处理时完全相同，
+        # 因此逐段处理的片段与全文中的对应内容逐字一致
+        byte_offsets = self._find_segment_boundaries(raw_window, encoding)
+        if byte_offset + len(raw_window) < stat.st_size:
+            # 窗口没有读到文件末尾时，丢弃最后一个不完整的分段
+            if len(byte_offsets) < 2:
+                return None, 0
+            content_end = byte_offsets.pop()
+        else:
+            content_end = len(raw_window)
+        window_content, _ = self._process_segments(raw_window, encoding, byte_offsets, content_end)
+        return window_content, char_offset
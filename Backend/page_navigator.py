@@ -0,0 +1,288 @@
+import bisect
+
+class PageNavigator:
+    """
+    基于完整字符串内容和字符索引的分页逻辑，与具体界面无关，
+    图形界面的阅读图层和终端阅读器共用，保证两者的翻页位置和阅读进度一致。
+    默认每行固定chars_per_line个字符；调用set_pixel_layout后改为按字符的像素宽度折行，
+    只排版当前位置附近的页面，改变图层尺寸时不需要重新排版整本书。
+    反向排版与正向排版的分页位置可能不同（按像素排版时的折行、越过跳过区间时的页面对齐），因此next_page记下翻页前的页面起点，
+    prev_page优先回到记下的起点；改变排版、替换内容或直接设置current_char_index（跳转）时清空记录。
+    """
+    def __init__(self, content, chars_per_line, lines_per_page, start_char_index=0,
+                 content_offset=0, skip_ranges=()):
+        # 快速恢复时content只是全文的一个片段，content_offset是它在全文中的起始字符索引；
+        # 字符索引始终以全文为准，后台加载完成后通过replace_content换成全文。
+        self.content = content
+        self.content_offset = content_offset
+        self.chars_per_line = chars_per_line
+        self.lines_per_page = lines_per_page
+        self.page_char_count = chars_per_line * lines_per_page
+        self.char_widths = None # 按像素排版时的字符宽度表（字符 -> 像素宽度），None为固定字数排版
+        self.line_width = 0
+        self._set_skip_ranges(skip_ranges)
+        self._page_start_history = [] # next_page翻过的各页起点，prev_page依次取回
+        self.current_char_index = self._skip_forward(start_char_index)
+        # 可选的页面转换（例如简繁转换），参数为(页面起始字符索引, 页面原始内容, content, 页面在content中的位置)，
+        # content供转换参考页面前后的文字；返回与原始内容等长的文本
+        self.page_transform = None
+
+    def set_pixel_layout(self, char_widths, line_width, lines_per_page):
+        """
+        改为按像素宽度排版：累加char_widths中的字符宽度，超过line_width时折行。
+        当前字符索引不变，新的页面从当前位置开始排版。
+        """
+        if char_widths is not self.char_widths or (line_width, lines_per_page) != (self.line_width, self.lines_per_page):
+            self._page_start_history.clear()
+        self.char_widths = char_widths
+        self.line_width = line_width
+        self.lines_per_page = lines_per_page
+
+    @property
+    def current_char_index(self):
+        return self._current_char_index
+
+    @current_char_index.setter
+    def current_char_index(self, char_index):
+        if char_index != getattr(self, "_current_char_index", None):
+            # 跳转之后，记下的页面起点不再是"上一页"
+            self._page_start_history.clear()
+        self._current_char_index = char_index
+
+    def page_content(self):
+        """当前页面的原始内容，页面在下一个跳过区间之前截止。"""
+        return self._page_content_at(self.current_char_index)
+
+    def _page_content_at(self, char_index):
+        local_index = char_index - self.content_offset
+        if local_index < 0:
+            return ""
+        page_length = self._page_end(char_index) - char_index
+        return self.content[local_index : local_index + page_length]
+
+    def prefetch(self):
+        """预先转换相邻的两页，翻页时直接命中页面转换的缓存。"""
+        if self.page_transform is None:
+            return
+        for char_index in (
+            self._skip_forward(self._page_end(self.current_char_index)),
+            self._prev_page_start(self.current_char_index),
+        ):
+            raw_page_content = self._page_content_at(char_index)
+            if raw_page_content:
+                self._transform(char_index, raw_page_content)
+
+    def page_lines(self):
+        """
+        把当前页面排版成lines_per_page行，每行用空格填充到chars_per_line个字符；
+        按像素排版时按宽度折行，不填充（图层尺寸固定）。已到末尾时返回空列表。
+        """
+        raw_page_content = self.page_content()
+        if not raw_page_content:
+            return []
+        if self.page_transform is not None:
+            raw_page_content = self._transform(self.current_char_index, raw_page_content)
+        if self.char_widths is not None:
+            return self._pixel_page_lines(raw_page_content)
+
+        displayed_lines = []
+        current_pos = 0
+        # 循环生成指定数量的行
+        for _ in range(self.lines_per_page):
+            if current_pos < len(raw_page_content):
+                # 截取当前行的内容
+                line_content = raw_page_content[current_pos : current_pos + self.chars_per_line]
+                # 填充空格，确保每行都达到 chars_per_line 的长度
+                displayed_lines.append(line_content.ljust(self.chars_per_line))
+                current_pos += self.chars_per_line
+            else:
+                # 如果内容不足，用空行（填充空格）补齐剩余的行数
+                displayed_lines.append(" " * self.chars_per_line)
+        return displayed_lines
+
+    def _pixel_page_lines(self, page_content):
+        # 页面转换前后逐字对齐，折行位置按原始内容计算
+        page_start = self.current_char_index
+        page_end = page_start + len(page_content)
+        displayed_lines = []
+        line_start = page_start
+        while line_start < page_end:
+            line_end = self._line_end(line_start, page_end)
+            displayed_lines.append(page_content[line_start - page_start : line_end - page_start])
+            line_start = line_end
+        return displayed_lines
+
+    def line_at(self, char_index):
+        """
+        从char_index开始的一行（不跨越跳过区间），用于逐行滚动。
+        返回 (经过页面转换的行文本, 下一行的起点)；已到末尾时返回 (None, char_index)。
+        """
+        local_index = char_index - self.content_offset
+        if local_index < 0 or local_index >= len(self.content):
+            return None, char_index
+        line_end = self._line_end(char_index, self._page_limit(char_index))
+        line_content = self.content[local_index : local_index + line_end - char_index]
+        if self.page_transform is not None:
+            line_content = self._transform(char_index, line_content)
+        return line_content, self._skip_forward(line_end)
+
+    def _transform(self, char_index, raw_text):
+        return self.page_transform(char_index, raw_text, self.content, char_index - self.content_offset)
+
+    def next_page(self):
+        """翻到下一页，成功时返回True。"""
+        next_index = self._skip_forward(self._page_end(self.current_char_index))
+        if next_index < self.content_offset + len(self.content):
+            self._page_start_history.append(self._current_char_index)
+            self._current_char_index = next_index
+            return True
+        return False
+
+    def prev_page(self):
+        """翻到上一页，成功时返回True。上一页是刚刚由next_page翻过的页面时，回到原来的起点。"""
+        if self._page_start_history:
+            self._current_char_index = self._page_start_history.pop()
+            return True
+        prev_index = self._prev_page_start(self.current_char_index)
+        if prev_index >= self.content_offset:
+            self._current_char_index = prev_index
+            return True
+        return False
+
+    def replace_content(self, content, skip_ranges=()):
+        """
+        用全文替换当前片段。字符索引不变，因此画面不会跳动；
+        只有原位置落在跳过区间内或超出全文时才会移动，此时返回True。
+        """
+        self.content = content
+        self.content_offset = 0
+        self._set_skip_ranges(skip_ranges)
+        self._page_start_history.clear()
+        char_index = self._skip_forward(self.current_char_index)
+        if char_index >= len(content) and content:
+            if self.char_widths is None:
+                char_index = ((len(content) - 1) // self.page_char_count) * self.page_char_count
+            else:
+                char_index = self._page_start_before(len(content))
+        if char_index == self.current_char_index:
+            return False
+        self.current_char_index = char_index
+        return True
+
+    def _set_skip_ranges(self, skip_ranges):
+        """设置翻页时跳过的区间（例如重复章节），区间为按起点排序且互不重叠的 (起点, 终点)。"""
+        self.skip_ranges = [tuple(skip_range) for skip_range in skip_ranges]
+        self._skip_starts = [start for start, _ in self.skip_ranges]
+
+    def _skip_forward(self, char_index):
+        """字符索引落在跳过区间内时，移动到该区间的终点。"""
+        position = bisect.bisect_right(self._skip_starts, char_index) - 1
+        while position >= 0:
+            start, end = self.skip_ranges[position]
+            if not start <= char_index < end:
+                break
+            char_index = end
+            position = bisect.bisect_right(self._skip_starts, char_index) - 1
+        return char_index
+
+    def _page_limit(self, char_index):
+        """从char_index开始的页面最远能到达的位置：下一个跳过区间的起点或内容末尾。"""
+        limit = self.content_offset + len(self.content)
+        position = bisect.bisect_right(self._skip_starts, char_index)
+        if position < len(self._skip_starts):
+            limit = min(limit, self._skip_starts[position])
+        return limit
+
+    def _line_end(self, char_index, limit):
+        """从char_index开始的一行的结束位置，不超过limit；按像素排版时每行至少一个字符。"""
+        if self.char_widths is None:
+            return min(char_index + self.chars_per_line, limit)
+        content = self.content
+        char_widths = self.char_widths
+        position = char_index - self.content_offset
+        local_limit = limit - self.content_offset
+        used_width = 0
+        while position < local_limit:
+            used_width += char_widths[content[position]]
+            if used_width > self.line_width and position > char_index - self.content_offset:
+                break
+            position += 1
+        return position + self.content_offset
+
+    def _line_start_before(self, char_index, lower_bound):
+        """按像素排版时，以char_index结尾的一行的起点，不早于lower_bound。"""
+        content = self.content
+        char_widths = self.char_widths
+        end = char_index - self.content_offset
+        position = end
+        local_lower_bound = lower_bound - self.content_offset
+        used_width = 0
+        while position > local_lower_bound:
+            used_width += char_widths[content[position - 1]]
+            if used_width > self.line_width and position < end:
+                break
+            position -= 1
+        return position + self.content_offset
+
+    def _page_end(self, char_index):
+        """从char_index开始的页面的结束位置：满一页，或者遇到下一个跳过区间为止。"""
+        limit = self._page_limit(char_index)
+        if self.char_widths is None:
+            return min(char_index + self.page_char_count, limit)
+        page_end = char_index
+        for _ in range(self.lines_per_page):
+            if page_end >= limit:
+                break
+            page_end = self._line_end(page_end, limit)
+        return page_end
+
+    def _page_start_before(self, char_index):
+        """
+        在char_index处结束的一页的起点，结果小于content_offset表示前面没有内容。
+        按像素排版时先从char_index向前逐行排版；正向排版可能比反向多装入几个字，
+        此时再找出页面不越过char_index的最大起点（页面终点随起点单调不减，可以二分查找）。
+        """
+        lower_bound = self.content_offset
+        if self.char_widths is None:
+            prev_index = char_index - self.page_char_count
+            # 当前位置没有按页对齐时（例如跳过区间之后，或者自动滚动停在某一行），上一页从内容开头开始
+            return max(prev_index, lower_bound) if char_index > lower_bound else prev_index
+        if char_index <= lower_bound:
+            return char_index - 1
+        start = char_index
+        for _ in range(self.lines_per_page):
+            if start <= lower_bound:
+                break
+            start = self._line_start_before(start, lower_bound)
+        if self._page_end(start) <= char_index:
+            return start
+        # 以倍增的步长向前找到一个满足条件的起点，再在它与start之间二分
+        step = 1
+        low = max(start - step, lower_bound)
+        while low > lower_bound and self._page_end(low) > char_index:
+            step *= 2
+            low = max(start - step, lower_bound)
+        if self._page_end(low) > char_index:
+            return low # 已到内容开头，当前位置在第一页之内
+        high = start
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._page_end(middle) <= char_index:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def _prev_page_start(self, char_index):
+        """上一页的起点；上一页范围内有跳过区间时，越过它显示区间之前的内容。"""
+        prev_index = self._page_start_before(char_index)
+        position = bisect.bisect_left(self._skip_starts, char_index) - 1
+        while position >= 0 and self.skip_ranges[position][1] > prev_index:
+            start, end = self.skip_ranges[position]
+            if end < char_index:
+                # 区间与当前页之间还有不足一页的正常内容
+                return end
+            char_index = start
+            prev_index = max(self._page_start_before(start), 0)
+            position -= 1
+        return prev_index
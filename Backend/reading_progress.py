@@ -0,0 +1,99 @@
+from datetime import datetime
+
+class ReadingProgress:
+    """
+    管理配置中每本书的阅读进度（progress）。
+    图形界面和终端阅读器共用同一套读写规则，两者保存的进度可以互相接续。
+    """
+    def __init__(self, app_settings, novel_handler):
+        self.app_settings = app_settings
+        self.novel_handler = novel_handler
+        # 最近一次get_start_char_index无法准确换算阅读位置时的提示，由界面显示给用户
+        self.position_warning = None
+
+    def try_warm_resume(self, book_name):
+        """
+        尝试用保存的恢复快照只加载阅读位置附近的片段。
+        成功时返回 (片段, 片段起始字符索引, SHA-256, 起始阅读字符索引)，否则返回None。
+        """
+        progress_entry = self.app_settings.get("progress", {}).get(book_name)
+        if not isinstance(progress_entry, dict) or self.novel_handler.has_cached_book(book_name):
+            return None
+        partial_content, content_offset = self.novel_handler.load_resume_window(
+            book_name, progress_entry.get("resume")
+        )
+        if not partial_content:
+            return None
+        try:
+            saved_char_index = int(progress_entry.get("char_index", 0))
+        except (TypeError, ValueError):
+            return None
+        if not content_offset <= saved_char_index < content_offset + len(partial_content):
+            return None
+        return partial_content, content_offset, progress_entry.get("sha256"), saved_char_index
+
+    def get_start_char_index(self, book_name, book_sha256, content_length, page_char_count):
+        """根据保存的进度计算这本书的起始阅读字符索引，书的内容变化时从头开始。"""
+        self.position_warning = None
+        progress_entry = self.app_settings.get("progress", {}).get(book_name)
+        if isinstance(progress_entry, dict):
+            if progress_entry.get("sha256") != book_sha256:
+                return 0
+            saved_char_index = progress_entry.get("char_index", 0)
+            try:
+                # 过滤规则变化后，借助恢复快照把字符索引换算到过滤后的新内容上
+                remapped_char_index = self.novel_handler.remap_char_index(
+                    book_name, progress_entry.get("resume"), int(saved_char_index)
+                )
+            except (TypeError, ValueError):
+                return 0
+            if remapped_char_index is None:
+                self.position_warning = "内容过滤规则（content_filter）已改变，无法准确换算上次的阅读位置，已跳转到大致位置。"
+            else:
+                saved_char_index = remapped_char_index
+        elif isinstance(progress_entry, int):
+            # 兼容旧版仅保存字符索引的配置，用户再次阅读后会迁移为新结构。
+            saved_char_index = progress_entry
+        else:
+            return 0
+
+        try:
+            saved_char_index = int(saved_char_index)
+        except (TypeError, ValueError):
+            return 0
+
+        if content_length <= 0 or page_char_count <= 0:
+            return 0
+
+        # 最后一页即使不足一整页也要保留，例如1000字、每页400字时，
+        # 合法的页面起点是0、400、800，而不是把800截回600。
+        max_start_index = ((content_length - 1) // page_char_count) * page_char_count
+        return max(0, min(saved_char_index, max_start_index))
+
+    def update(self, book_name, book_sha256, char_index):
+        """在内存中记录阅读进度，并附带用于快速恢复的快照；是否写入文件由调用方决定。"""
+        progress = self.app_settings.setdefault("progress", {})
+        previous_entry = progress.get(book_name)
+        resume_snapshot = self.novel_handler.get_resume_snapshot(book_name, char_index)
+        if (
+            resume_snapshot is None
+            and isinstance(previous_entry, dict)
+            and previous_entry.get("sha256") == book_sha256
+            and isinstance(previous_entry.get("resume"), dict)
+            and previous_entry["resume"].get("filter_hash", "") == self.novel_handler.content_filter.filter_hash
+        ):
+            # 全文还在后台加载时没有新的检查点，沿用本次启动所用的快照；
+            # 阅读位置移动后，快照中的行首位置不再对应当前位置，不能再用来换算
+            resume_snapshot = previous_entry.get("resume")
+            if previous_entry.get("char_index") != char_index:
+                resume_snapshot = {
+                    key: value for key, value in resume_snapshot.items()
+                    if key not in ("line_byte_offset", "line_char_index")
+                }
+        progress[book_name] = {
+            "sha256": book_sha256,
+            "char_index": char_index,
+            "last_read": datetime.now().astimezone().isoformat(timespec="seconds"),
+        }
+        if resume_snapshot is not None:
+            progress[book_name]["resume"] = resume_snapshot
@@ -0,0 +1,149 @@
+from collections import deque
+
+from PySide6.QtCore import QElapsedTimer, QPointF, Qt, QTimer, Signal
+from PySide6.QtGui import QColor, QFontMetrics, QPainter, QStaticText
+from PySide6.QtWidgets import QWidget
+
+class AutoScroller(QWidget):
+    """
+    阅读图层的自动滚动画布，覆盖在文字标签之上。
+    后续若干行预先排版成QStaticText放在环形缓冲区中，每帧只改变绘制的纵向偏移并重绘，
+    不做字符串切片、拼接，也不触发QLabel.setText的重新排版；每滚过一行才在空闲时补充一行。
+    滚动位置由实际经过的时间换算，定时器的抖动不会累积成速度误差。
+    """
+    line_advanced = Signal(int) # 滚过一行后发出，参数为新的首行字符索引
+    finished = Signal() # 最后一页完整显示后发出
+
+    FRAME_INTERVAL_MS = 16
+    PADDING = 10 # 与文字标签样式表中的padding一致
+
+    def __init__(self, navigator, font, font_color, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents, True)
+        self.setFont(font)
+        self.navigator = navigator
+        self.line_height = QFontMetrics(font).lineSpacing()
+        self._pen_color = QColor(font_color)
+        self._lines = deque() # 环形缓冲区，元素为 (行起点字符索引, 排版好的QStaticText)
+        self._capacity = 0
+        self._next_char_index = 0 # 缓冲区之后下一行的起点
+        self._exhausted = False
+        self._offset = 0.0
+        self._line_interval_ms = 2000.0
+        self._smooth = True
+        self._position_base = 0.0 # 暂停前已经滚过的行数（可含小数）
+        self._lines_scrolled = 0
+        self._clock = QElapsedTimer()
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setTimerType(Qt.PreciseTimer)
+        self._frame_timer.timeout.connect(self._on_frame)
+        self.hide()
+
+    def start(self, lines_per_minute, smooth):
+        """
+        从导航器的当前位置开始滚动。smooth为True时逐像素平滑滚动，否则逐行跳动。
+        没有可显示的内容时返回False。
+        """
+        self._line_interval_ms = 60_000 / max(lines_per_minute, 1)
+        self._smooth = smooth
+        # 按像素排版时每页行数随图层尺寸变化，开始滚动时再确定缓冲区大小
+        self._capacity = self.navigator.lines_per_page * 2 + 1
+        self._lines.clear()
+        self._next_char_index = self.navigator.current_char_index
+        self._exhausted = False
+        self._offset = 0.0
+        self._position_base = 0.0
+        self._lines_scrolled = 0
+        self._top_up()
+        if not self._lines:
+            return False
+        self.show()
+        self.update()
+        self.resume()
+        return True
+
+    def stop(self):
+        self._frame_timer.stop()
+        self._lines.clear()
+        # 之前排队的_top_up仍会执行，标记为没有后续内容，避免它把缓冲区重新填满
+        self._exhausted = True
+        self.hide()
+
+    def pause(self):
+        if not self._frame_timer.isActive():
+            return
+        self._position_base = self._scroll_position()
+        self._frame_timer.stop()
+
+    def resume(self):
+        if self._frame_timer.isActive() or not self._lines:
+            return
+        self._clock.restart()
+        self._frame_timer.start(self.FRAME_INTERVAL_MS if self._smooth else round(self._line_interval_ms))
+
+    def is_active(self):
+        """正在滚动或处于暂停状态。"""
+        return bool(self._lines)
+
+    def is_running(self):
+        return self._frame_timer.isActive()
+
+    def current_char_index(self):
+        """当前首行的字符索引，即以行为粒度的阅读进度。"""
+        return self._lines[0][0] if self._lines else self.navigator.current_char_index
+
+    def _scroll_position(self):
+        return self._position_base + self._clock.elapsed() / self._line_interval_ms
+
+    def _top_up(self):
+        """把缓冲区补满；排版只发生在这里，不在每一帧中进行。"""
+        while not self._exhausted and len(self._lines) < self._capacity:
+            line_content, next_char_index = self.navigator.line_at(self._next_char_index)
+            if line_content is None:
+                self._exhausted = True
+                break
+            static_text = QStaticText(line_content)
+            static_text.setTextFormat(Qt.PlainText)
+            static_text.prepare(font=self.font())
+            self._lines.append((self._next_char_index, static_text))
+            self._next_char_index = next_char_index
+
+    def _on_frame(self):
+        position = self._scroll_position()
+        whole_lines = int(position)
+        advanced = False
+        while self._lines_scrolled < whole_lines:
+            if len(self._lines) <= self.navigator.lines_per_page:
+                # 缓冲区通常已提前补充，只有长时间卡顿后才需要在这一帧里补充
+                self._top_up()
+            if len(self._lines) <= self.navigator.lines_per_page:
+                # 最后一页已经完整显示
+                self._offset = 0.0
+                self.pause()
+                self.update()
+                self.finished.emit()
+                return
+            self._lines.popleft()
+            self._lines_scrolled += 1
+            advanced = True
+        self._offset = (position - whole_lines) * self.line_height if self._smooth else 0.0
+        if self._exhausted and len(self._lines) <= self.navigator.lines_per_page:
+            self._offset = 0.0
+        if advanced:
+            self.line_advanced.emit(self._lines[0][0])
+            # 在两帧之间的空闲时间补充缓冲区
+            QTimer.singleShot(0, self._top_up)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setFont(self.font())
+        painter.setPen(self._pen_color)
+        painter.setClipRect(self.rect().adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING))
+        y = self.PADDING - self._offset
+        bottom = self.height() - self.PADDING
+        for _, static_text in self._lines:
+            if y >= bottom:
+                break
+            painter.drawStaticText(QPointF(self.PADDING, y), static_text)
+            y += self.line_height
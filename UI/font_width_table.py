@@ -0,0 +1,27 @@
+from PySide6.QtGui import QFontMetricsF
+
+class FontWidthTable(dict):
+    """
+    某一字体和字号下每个字符的像素宽度表（字符 -> 横向步进），供PageNavigator按像素排版。
+    字符第一次出现时才查询QFontMetricsF并记入表中，之后排版只是字典查找；
+    同一(字体, 字号)共用一张表，改变图层尺寸或重新打开阅读图层都不需要重新测量。
+    """
+    _tables = {} # (字体, 字号) -> FontWidthTable
+
+    def __init__(self, font):
+        super().__init__()
+        self._metrics = QFontMetricsF(font)
+        self.line_spacing = self._metrics.lineSpacing()
+
+    @classmethod
+    def for_font(cls, font):
+        key = (font.family(), font.pointSizeF())
+        table = cls._tables.get(key)
+        if table is None:
+            table = cls._tables[key] = cls(font)
+        return table
+
+    def __missing__(self, char):
+        width = self._metrics.horizontalAdvance(char)
+        self[char] = width
+        return width
@@ -1,6 +1,6 @@
 import sys
 import os
-from datetime import datetime
+from threading import Thread
 
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(project_root)
@@ -8,16 +8,21 @@ sys.path.append(project_root)
 import qdarkstyle # 把它加回来
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QGridLayout, QHBoxLayout,
-    QComboBox, QLabel, QSpinBox, QPushButton, QLineEdit,
+    QComboBox, QLabel, QSpinBox, QPushButton, QLineEdit, QCheckBox,
     QColorDialog, QMessageBox, QMenu, QSystemTrayIcon
 )
 from PySide6.QtGui import QAction, QColor, QIcon
-from PySide6.QtCore import QEvent, Qt, QTimer
+from PySide6.QtCore import QEvent, Qt, QTimer, Signal
 
 # --- 后端模块导入 ---
 from Backend.novel_handler import NovelHandler
 from Backend.config_handler import ConfigHandler
+from Backend.content_filter import ContentFilter
+from Backend.chapter_dedup import ChapterDeduplicator
+from Backend.reading_progress import ReadingProgress
+from Backend.chinese_converter import ChineseConverter, PageConversionCache
 from UI.reader_view import ReaderView
+from UI.stall_watchdog import StallWatchdog
 
 class MainWindow(QMainWindow):
     """
@@ -26,14 +31,21 @@ class MainWindow(QMainWindow):
     """
     MINIMUM_DRAGGABLE_OPACITY = 1 / 255
     PROGRESS_AUTOSAVE_INTERVAL_MS = 10_000
+    CHINESE_CONVERSION_OPTIONS = [("不转换", ""), ("繁体 → 简体", "t2s"), ("简体 → 繁体", "s2t")]
+
+    full_book_loaded = Signal(str, object, object) # 后台加载完成时发出，参数为(书名, 加载结果, 查重结果)
+    duplicate_chapters_found = Signal(str, object, object) # 后台查重完成时发出，参数为(书名, 内容, 查重结果)
 
     def __init__(self):
         super().__init__()
 
         # --- 初始化后端处理器 ---
-        self.novel_handler = NovelHandler()
         self.config_handler = ConfigHandler()
         self.app_settings = self.config_handler.load_settings()
+        self.novel_handler = NovelHandler(cache_dir=os.path.join(self.config_handler.config_dir, "cache"))
+        self.novel_handler.set_content_filter(ContentFilter.from_settings(self.app_settings))
+        self.reading_progress = ReadingProgress(self.app_settings, self.novel_handler)
+        self._chinese_converters = {} # 转换方向 -> 已加载词典的ChineseConverter
         self.reader_view = None
         self._has_readable_books = False
         self._opacity_is_valid = True
@@ -42,12 +54,16 @@ class MainWindow(QMainWindow):
         self._progress_autosave_timer = QTimer(self)
         self._progress_autosave_timer.setInterval(self.PROGRESS_AUTOSAVE_INTERVAL_MS)
         self._progress_autosave_timer.timeout.connect(self._autosave_progress)
+        self.full_book_loaded.connect(self.on_full_book_loaded)
+        self.duplicate_chapters_found.connect(self.on_duplicate_chapters_found)
+        self._stall_watchdog = None
+        self._setup_stall_watchdog()
 
         self._setup_tray_icon()
 
         # --- 窗口基本设置 ---
         self.setWindowTitle("有时间还是要多读书 - 丁真")
-        self.setFixedSize(400, 550) # 增加了高度以容纳新控件
+        self.setFixedSize(400, 680) # 增加了高度以容纳新控件
 
         # --- 中心控件和主布局 ---
         central_widget = QWidget()
@@ -197,6 +213,40 @@ class MainWindow(QMainWindow):
             self.paging_combo.setCurrentText(configured_paging)
         grid_layout.addWidget(self.paging_combo, 9, 1, 1, 2)
 
+        # 11. 简繁转换
+        grid_layout.addWidget(QLabel("简繁转换:"), 10, 0)
+        self.conversion_combo = QComboBox()
+        for text, direction in self.CHINESE_CONVERSION_OPTIONS:
+            self.conversion_combo.addItem(text, direction)
+        # 从配置中恢复转换方向
+        configured_conversion = self.app_settings.get("chinese_conversion", "")
+        conversion_index = self.conversion_combo.findData(configured_conversion)
+        if conversion_index >= 0:
+            self.conversion_combo.setCurrentIndex(conversion_index)
+        grid_layout.addWidget(self.conversion_combo, 10, 1, 1, 2)
+
+        # 12. 按图层像素尺寸自动排版
+        grid_layout.addWidget(QLabel("自动排版:"), 11, 0)
+        self.auto_fit_checkbox = QCheckBox("按图层尺寸计算行数和字数")
+        self.auto_fit_checkbox.setChecked(self.app_settings.get("auto_fit", False))
+        self.auto_fit_checkbox.toggled.connect(self._on_auto_fit_toggled)
+        grid_layout.addWidget(self.auto_fit_checkbox, 11, 1, 1, 2)
+
+        # 13. 图层尺寸（像素），阅读时也可以拖动图层右下角调整
+        grid_layout.addWidget(QLabel("图层尺寸:"), 12, 0)
+        overlay_size_layout = QHBoxLayout()
+        self.overlay_width_spinbox = QSpinBox()
+        self.overlay_width_spinbox.setRange(100, 3840)
+        self.overlay_width_spinbox.setValue(self.app_settings.get("overlay_width", 600))
+        self.overlay_height_spinbox = QSpinBox()
+        self.overlay_height_spinbox.setRange(60, 2160)
+        self.overlay_height_spinbox.setValue(self.app_settings.get("overlay_height", 300))
+        overlay_size_layout.addWidget(self.overlay_width_spinbox, 1)
+        overlay_size_layout.addWidget(QLabel("×"), 0, Qt.AlignCenter)
+        overlay_size_layout.addWidget(self.overlay_height_spinbox, 1)
+        grid_layout.addLayout(overlay_size_layout, 12, 1, 1, 2)
+        self._on_auto_fit_toggled(self.auto_fit_checkbox.isChecked())
+
         # --- 控制按钮 ---
         self.start_button = QPushButton("启动阅读")
         self.start_button.setFixedHeight(40)
@@ -212,6 +262,18 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(self.start_button)
         main_layout.addWidget(self.quit_button)
 
+    def _setup_stall_watchdog(self):
+        """按配置启用主线程卡顿监测，报告写入配置目录下的stall.log。"""
+        if not self.app_settings.get("stall_watchdog", False):
+            return
+        try:
+            threshold_ms = int(self.app_settings.get("stall_threshold_ms", 50))
+        except (TypeError, ValueError):
+            threshold_ms = 50
+        log_path = os.path.join(self.config_handler.config_dir, "stall.log")
+        self._stall_watchdog = StallWatchdog(log_path, threshold_ms, self)
+        self._stall_watchdog.start()
+
     def _setup_tray_icon(self):
         self._tray_available = QSystemTrayIcon.isSystemTrayAvailable()
         self.tray_icon = QSystemTrayIcon(self)
@@ -258,6 +320,32 @@ class MainWindow(QMainWindow):
         self.tray_icon.hide()
         self.close()
 
+    def handle_launch_args(self, args):
+        """
+        处理启动参数（首次启动或由后启动的实例转发而来）。
+        可选的第一个参数为书名：正在阅读这本书时直接显示阅读图层，否则切换到该书开始阅读；
+        没有参数时只把设置窗口从托盘还原到前台。
+        """
+        book_name = os.path.basename(args[0]) if args else None
+        available_books = [self.book_selector.itemText(i) for i in range(self.book_selector.count())]
+        if not book_name or not self._has_readable_books or book_name not in available_books:
+            self._restore_from_tray()
+            if self.reader_view is not None:
+                self.reader_view.show()
+            return
+
+        if self.reader_view is not None:
+            if self.reader_view.settings.get("selected_book") == book_name:
+                self.reader_view.show()
+                self.reader_view.activateWindow()
+                self.reader_view.setFocus()
+                return
+            # 关闭当前图层会同步保存进度并清空reader_view
+            self.reader_view.close()
+
+        self.book_selector.setCurrentText(book_name)
+        self.start_reading()
+
     def load_books_to_selector(self):
         """从后端加载书籍列表并更新到下拉框"""
         book_list = self.novel_handler.get_all_books_names()
@@ -330,32 +418,53 @@ class MainWindow(QMainWindow):
             "minimize_hotkey": minimize_hotkey,
             "close_hotkey": close_hotkey,
             "paging_hotkey": self.paging_combo.currentText(),
+            "chinese_conversion": self.conversion_combo.currentData(),
+            "auto_scroll_lines_per_minute": self.app_settings.get("auto_scroll_lines_per_minute", 30),
+            "auto_scroll_smooth": self.app_settings.get("auto_scroll_smooth", True),
+            "auto_fit": self.auto_fit_checkbox.isChecked(),
+            "overlay_width": self.overlay_width_spinbox.value(),
+            "overlay_height": self.overlay_height_spinbox.value(),
         }
 
-        # 2. 加载小说内容为完整字符串
-        full_content, book_sha256, error_msg = self.novel_handler.load_book_with_metadata(selected_book)
-        if error_msg:
-            QMessageBox.critical(self, "读取小说失败", error_msg)
-            return
-
-        # 3. 获取这本书的起始阅读字符索引
-        start_char_index = self._get_start_char_index(
-            selected_book,
-            book_sha256,
-            len(full_content),
-            settings["chars_per_line"] * settings["lines_per_page"],
-        )
+        # 2. 优先根据恢复快照只加载上次阅读位置附近的内容，全文留给后台处理；
+        #    没有可用快照时，同步加载小说内容为完整字符串
+        warm_resume = self.reading_progress.try_warm_resume(selected_book)
+        if warm_resume is not None:
+            content, content_offset, book_sha256, start_char_index = warm_resume
+        else:
+            content, book_sha256, error_msg = self.novel_handler.load_book_with_metadata(selected_book)
+            if error_msg:
+                QMessageBox.critical(self, "读取小说失败", error_msg)
+                return
+            content_offset = 0
+
+            # 3. 获取这本书的起始阅读字符索引
+            start_char_index = self.reading_progress.get_start_char_index(
+                selected_book,
+                book_sha256,
+                len(content),
+                settings["chars_per_line"] * settings["lines_per_page"],
+            )
+            if self.reading_progress.position_warning:
+                QMessageBox.warning(self, "阅读位置可能不准确", self.reading_progress.position_warning)
         settings["start_char_index"] = start_char_index
         settings["book_sha256"] = book_sha256
 
         # 4. 创建和显示ReaderView
-        self.reader_view = ReaderView(settings, full_content)
+        page_conversion = self._create_page_conversion(settings["chinese_conversion"])
+        self.reader_view = ReaderView(settings, content, content_offset, page_conversion)
         self.reader_view.progress_changed.connect(self.on_reader_progress_changed)
         self.reader_view.closed.connect(self.on_reader_closed)
+        self.reader_view.overlay_resized.connect(self.on_overlay_resized)
         self._refresh_start_button()
         self.reader_view.show()
         self.reader_view.activateWindow()
         self.reader_view.setFocus()
+        if warm_resume is not None:
+            self._load_full_book_in_background(selected_book)
+        else:
+            self._attach_converted_book(page_conversion, book_sha256, content)
+            self._find_duplicate_chapters_in_background(selected_book, content)
 
         # 5. 保存当前配置到文件
         # 确保保存的配置包含所有UI上的最新值，以及当前选择的书籍
@@ -368,40 +477,102 @@ class MainWindow(QMainWindow):
         self.app_settings["minimize_hotkey"] = settings["minimize_hotkey"]
         self.app_settings["close_hotkey"] = settings["close_hotkey"]
         self.app_settings["paging_hotkey"] = settings["paging_hotkey"]
+        self.app_settings["chinese_conversion"] = settings["chinese_conversion"]
+        self.app_settings["auto_fit"] = settings["auto_fit"]
+        self.app_settings["overlay_width"] = settings["overlay_width"]
+        self.app_settings["overlay_height"] = settings["overlay_height"]
         self.app_settings["last_selected_book"] = settings["selected_book"]
         self._save_app_settings()
 
-    def _get_start_char_index(self, book_name, book_sha256, content_length, page_char_count):
-        progress_entry = self.app_settings.get("progress", {}).get(book_name)
-        if isinstance(progress_entry, dict):
-            if progress_entry.get("sha256") != book_sha256:
-                return 0
-            saved_char_index = progress_entry.get("char_index", 0)
-        elif isinstance(progress_entry, int):
-            # 兼容旧版仅保存字符索引的配置，用户再次阅读后会迁移为新结构。
-            saved_char_index = progress_entry
-        else:
-            return 0
+    def _load_full_book_in_background(self, book_name):
+        def load():
+            result = self.novel_handler.load_book_with_metadata(book_name)
+            dedup_result = self._find_duplicate_chapters(result[0]) if result[0] is not None else None
+            self.full_book_loaded.emit(book_name, result, dedup_result)
+        Thread(target=load, daemon=True).start()
+
+    def on_full_book_loaded(self, book_name, result, dedup_result):
+        """后台加载完成后，把阅读图层中的片段替换为全文。"""
+        full_content, book_sha256, error_msg = result
+        if self.reader_view is None or self.reader_view.settings.get("selected_book") != book_name:
+            return
+        if error_msg:
+            # 加载失败时继续使用已显示的片段
+            return
+        self.reader_view.settings["book_sha256"] = book_sha256
+        skip_ranges = ()
+        if dedup_result is not None:
+            skip_ranges = dedup_result[0]
+            self._report_duplicate_chapters(book_name, dedup_result[1])
+        self.reader_view.replace_content(full_content, skip_ranges)
+        self._attach_converted_book(self.reader_view.navigator.page_transform, book_sha256, full_content)
+
+    def _find_duplicate_chapters_in_background(self, book_name, content):
+        """查重耗时与全文长度成正比，放到后台线程中进行，完成后再让阅读图层跳过重复章节。"""
+        if not self.app_settings.get("dedup_chapters", False):
+            return
+        def find():
+            self.duplicate_chapters_found.emit(book_name, content, self._find_duplicate_chapters(content))
+        Thread(target=find, daemon=True).start()
 
+    def on_duplicate_chapters_found(self, book_name, content, dedup_result):
+        if self.reader_view is None or self.reader_view.navigator.content is not content:
+            # 阅读图层已经关闭，或者已经换成了别的内容
+            return
+        self._report_duplicate_chapters(book_name, dedup_result[1])
+        self.reader_view.replace_content(content, dedup_result[0])
+
+    def _create_page_conversion(self, direction):
+        """按所选方向创建逐页简繁转换缓存；不转换或缺少词典时返回None。"""
+        if not direction:
+            return None
+        converter = self._chinese_converters.get(direction)
+        if converter is None:
+            converter = ChineseConverter.from_settings({"chinese_conversion": direction})
+            if converter is None:
+                QMessageBox.warning(self, "简繁转换不可用", "未找到OpenCC词典，请安装opencc-python-reimplemented。")
+                return None
+            # 词典只加载一次，之后打开其他书时直接复用
+            self._chinese_converters[direction] = converter
+        return PageConversionCache(converter)
+
+    def _attach_converted_book(self, page_conversion, book_sha256, content):
+        """在后台读取（或按配置生成并保存）整本书的转换结果。"""
+        if page_conversion is None:
+            return
+        persist = self.app_settings.get("persist_chinese_conversion", False)
+        Thread(
+            target=page_conversion.attach_book,
+            args=(self.novel_handler, book_sha256, content, persist),
+            daemon=True,
+        ).start()
+
+    def _find_duplicate_chapters(self, content):
+        """按配置查找重复章节，返回 (跳过区间列表, 报告列表)；未启用时返回None。"""
+        if not self.app_settings.get("dedup_chapters", False):
+            return None
+        return ChapterDeduplicator().find_duplicates(content)
+
+    def _report_duplicate_chapters(self, book_name, report):
+        """把跳过的重复章节写入配置目录下的dedup_report.txt，并在开始按钮的提示中显示数量。"""
+        if not report:
+            self.start_button.setToolTip("")
+            return
+        lines = [f"《{book_name}》跳过了 {len(report)} 个重复章节："]
+        for item in report:
+            lines.append(
+                f"{item['title']}（字符 {item['start']} - {item['end']}）与“{item['duplicate_of']}”重复"
+            )
+        report_path = os.path.join(self.config_handler.config_dir, "dedup_report.txt")
         try:
-            saved_char_index = int(saved_char_index)
-        except (TypeError, ValueError):
-            return 0
-
-        if content_length <= 0 or page_char_count <= 0:
-            return 0
-
-        # 最后一页即使不足一整页也要保留，例如1000字、每页400字时，
-        # 合法的页面起点是0、400、800，而不是把800截回600。
-        max_start_index = ((content_length - 1) // page_char_count) * page_char_count
-        return max(0, min(saved_char_index, max_start_index))
+            with open(report_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            pass
+        self.start_button.setToolTip(f"已跳过 {len(report)} 个重复章节，详见 {report_path}")
 
     def _update_progress(self, book_name, book_sha256, char_index):
-        self.app_settings.setdefault("progress", {})[book_name] = {
-            "sha256": book_sha256,
-            "char_index": char_index,
-            "last_read": datetime.now().astimezone().isoformat(timespec="seconds"),
-        }
+        self.reading_progress.update(book_name, book_sha256, char_index)
         self._progress_dirty = True
 
     def on_reader_progress_changed(self, book_name, book_sha256, char_index):
@@ -419,6 +590,13 @@ class MainWindow(QMainWindow):
         else:
             self._progress_autosave_timer.stop()
 
+    def on_overlay_resized(self, width, height):
+        """记住拖动调整后的图层尺寸，关闭图层时随阅读进度一起保存。"""
+        self.app_settings["overlay_width"] = width
+        self.app_settings["overlay_height"] = height
+        self.overlay_width_spinbox.setValue(width)
+        self.overlay_height_spinbox.setValue(height)
+
     def on_reader_closed(self, book_name, book_sha256, last_char_index):
         """当阅读窗口关闭时，立即保存最终阅读进度。"""
         self._update_progress(book_name, book_sha256, last_char_index)
@@ -430,6 +608,7 @@ class MainWindow(QMainWindow):
 
     def _save_app_settings(self):
         try:
+            self.config_handler.merge_newer_progress(self.app_settings)
             self.config_handler.save_settings(self.app_settings)
             return True
         except OSError:
@@ -442,6 +621,13 @@ class MainWindow(QMainWindow):
             self._has_readable_books and self._opacity_is_valid and not is_reading
         )
 
+    def _on_auto_fit_toggled(self, checked):
+        # 自动排版时行数和每行字数由图层尺寸决定
+        self.lines_spinbox.setEnabled(not checked)
+        self.chars_spinbox.setEnabled(not checked)
+        self.overlay_width_spinbox.setEnabled(checked)
+        self.overlay_height_spinbox.setEnabled(checked)
+
     def _validate_opacity_input(self, text):
         try:
             value = float(text)
@@ -468,6 +654,8 @@ class MainWindow(QMainWindow):
         self._progress_autosave_timer.stop()
         if self.reader_view is not None:
             self.reader_view.close()
+        if self._stall_watchdog is not None:
+            self._stall_watchdog.stop()
         event.accept()
 
 # --- 程序入口 ---
@@ -1,9 +1,13 @@
 from threading import Thread
 from pynput import keyboard
-from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout
-from PySide6.QtCore import Qt, Signal, Slot
+from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QSizeGrip, QSizePolicy
+from PySide6.QtCore import Qt, QTimer, Signal, Slot
 from PySide6.QtGui import QKeyEvent, QMouseEvent, QFont
 
+from Backend.page_navigator import PageNavigator
+from UI.auto_scroller import AutoScroller
+from UI.font_width_table import FontWidthTable
+
 class ReaderView(QWidget):
     """
     基于完整字符串内容和字符索引来显示小说的阅读图层。
@@ -13,16 +17,26 @@ class ReaderView(QWidget):
     close_signal = Signal()
     progress_changed = Signal(str, str, int) # 参数为(书名, SHA-256, 字符索引)
     closed = Signal(str, str, int) # 关闭时发出，参数为(书名, SHA-256, 字符索引)
+    overlay_resized = Signal(int, int) # 按像素排版时图层尺寸改变后发出，参数为(宽, 高)
+
+    PREFETCH_DELAY_MS = 30
 
-    def __init__(self, settings, full_content):
+    def __init__(self, settings, full_content, content_offset=0, page_transform=None):
         super().__init__()
 
         # --- 初始化成员变量 ---
         self.settings = settings
-        self.full_content = full_content
         self.hotkey_listener = None
-        self.current_char_index = self.settings.get("start_char_index", 0)
-        self.page_char_count = self.settings.get("chars_per_line", 40) * self.settings.get("lines_per_page", 10)
+        # 快速恢复时full_content只是全文的一个片段，见PageNavigator
+        self.navigator = PageNavigator(
+            full_content,
+            self.settings.get("chars_per_line", 40),
+            self.settings.get("lines_per_page", 10),
+            self.settings.get("start_char_index", 0),
+            content_offset,
+        )
+        # 可选的页面转换（例如简繁转换），只作用于显示的页面
+        self.navigator.page_transform = page_transform
 
         # --- 窗口属性设置 ---
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
@@ -30,7 +44,13 @@ class ReaderView(QWidget):
         self.setAttribute(Qt.WA_TranslucentBackground, True)
         self.setFocusPolicy(Qt.StrongFocus)
 
-        self.resize(600, 400)
+        # 按像素排版时图层尺寸由用户指定，行数和每行字数按字体的实际宽度计算
+        self.auto_fit = self.settings.get("auto_fit", False)
+        if self.auto_fit:
+            self.setMinimumSize(100, 60)
+            self.resize(self.settings.get("overlay_width", 600), self.settings.get("overlay_height", 300))
+        else:
+            self.resize(600, 400)
 
         # --- UI控件设置 ---
         self.text_label = QLabel(self)
@@ -39,6 +59,11 @@ class ReaderView(QWidget):
         self.text_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
         font = QFont()
         font.setPointSize(self.settings.get("font_size", 14))
+        if self.auto_fit:
+            # 关闭字距调整，一行的宽度正好等于各字符宽度之和
+            font.setKerning(False)
+            # 标签尺寸跟随窗口，不由文字内容决定
+            self.text_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
         self.text_label.setFont(font)
         
         # 直接使用传入的background_color，它现在是带有alpha通道的rgba字符串
@@ -55,6 +80,19 @@ class ReaderView(QWidget):
         main_layout.addWidget(self.text_label)
         main_layout.setContentsMargins(0, 0, 0, 0)
 
+        # --- 自动滚动画布，覆盖在文字标签之上 ---
+        self.auto_scroller = AutoScroller(self.navigator, font, font_color, self)
+        self.auto_scroller.line_advanced.connect(self._on_auto_scroll_line_advanced)
+        self.auto_scroller.finished.connect(self.stop_auto_scroll)
+
+        # --- 按像素排版时，拖动右下角调整图层尺寸 ---
+        self.width_table = None
+        self.size_grip = None
+        if self.auto_fit:
+            self.width_table = FontWidthTable.for_font(font)
+            self.size_grip = QSizeGrip(self)
+            self._apply_pixel_layout()
+
         # --- 信号连接 ---
         self.toggle_visibility_signal.connect(self.toggle_visibility)
         self.close_signal.connect(self.close)
@@ -64,52 +102,90 @@ class ReaderView(QWidget):
         self.update_display()
         self.start_hotkey_listener()
 
-    def update_display(self):
-        """根据当前字符索引，从完整字符串中切片、排版并显示内容"""
-        chars_per_line = self.settings.get("chars_per_line", 40)
-        lines_per_page = self.settings.get("lines_per_page", 10)
+    def _apply_pixel_layout(self):
+        """按当前窗口尺寸计算每行宽度和行数，只重新排版当前位置开始的页面。"""
+        text_width = self.width() - 2 * AutoScroller.PADDING
+        text_height = self.height() - 2 * AutoScroller.PADDING
+        lines_per_page = max(int(text_height // self.width_table.line_spacing), 1)
+        self.navigator.set_pixel_layout(self.width_table, max(text_width, 1), lines_per_page)
 
-        # 计算当前页面应该显示的总字符数
-        max_content_length = chars_per_line * lines_per_page
+    @property
+    def current_char_index(self):
+        return self.navigator.current_char_index
 
-        # 从完整内容中截取当前页面的原始内容
-        raw_page_content = self.full_content[self.current_char_index : self.current_char_index + max_content_length]
-        
-        if not raw_page_content:
+    def update_display(self):
+        """根据当前字符索引，从完整字符串中切片、排版并显示内容"""
+        if self.auto_scroller.is_active():
+            # 自动滚动期间文字由画布绘制
+            return
+        displayed_lines = self.navigator.page_lines()
+        if not displayed_lines:
             self.text_label.setText("(已到末尾)")
             return
 
-        displayed_lines = []
-        current_pos = 0
-        # 循环生成指定数量的行
-        for _ in range(lines_per_page):
-            if current_pos < len(raw_page_content):
-                # 截取当前行的内容
-                line_content = raw_page_content[current_pos : current_pos + chars_per_line]
-                # 填充空格，确保每行都达到 chars_per_line 的长度
-                displayed_lines.append(line_content.ljust(chars_per_line))
-                current_pos += chars_per_line
-            else:
-                # 如果内容不足，用空行（填充空格）补齐剩余的行数
-                displayed_lines.append(" " * chars_per_line)
-        
         # 将所有行用换行符连接并设置到 QLabel
         self.text_label.setText("\n".join(displayed_lines))
+        if self.navigator.page_transform is not None:
+            # 当前页绘制之后再预先转换相邻页面
+            QTimer.singleShot(self.PREFETCH_DELAY_MS, self.navigator.prefetch)
+
+    def toggle_auto_scroll(self):
+        """停止状态下开始自动滚动，滚动中则停止，暂停中（例如按过老板键）则继续。"""
+        if not self.auto_scroller.is_active():
+            self.start_auto_scroll()
+        elif self.auto_scroller.is_running():
+            self.stop_auto_scroll()
+        else:
+            self.auto_scroller.resume()
+
+    def start_auto_scroll(self):
+        self.auto_scroller.setGeometry(self.text_label.geometry())
+        if not self.auto_scroller.start(
+            self.settings.get("auto_scroll_lines_per_minute", 30),
+            self.settings.get("auto_scroll_smooth", True),
+        ):
+            return
+        # 滚动期间由画布绘制文字，标签只保留同样大小的空白页作为背景
+        if self.auto_fit:
+            self.text_label.setText("")
+            return
+        chars_per_line = self.settings.get("chars_per_line", 40)
+        lines_per_page = self.settings.get("lines_per_page", 10)
+        self.text_label.setText("\n".join([" " * chars_per_line] * lines_per_page))
+
+    @Slot()
+    def stop_auto_scroll(self):
+        if not self.auto_scroller.is_active():
+            return
+        self.navigator.current_char_index = self.auto_scroller.current_char_index()
+        self.auto_scroller.stop()
+        self.update_display()
+        self._emit_progress()
+
+    @Slot(int)
+    def _on_auto_scroll_line_advanced(self, char_index):
+        # 以行为粒度记录进度
+        self.navigator.current_char_index = char_index
+        self._emit_progress()
 
     def next_page(self):
-        next_index = self.current_char_index + self.page_char_count
-        if next_index < len(self.full_content):
-            self.current_char_index = next_index
+        self.stop_auto_scroll()
+        if self.navigator.next_page():
             self.update_display()
             self._emit_progress()
 
     def prev_page(self):
-        prev_index = self.current_char_index - self.page_char_count
-        if prev_index >= 0:
-            self.current_char_index = prev_index
+        self.stop_auto_scroll()
+        if self.navigator.prev_page():
             self.update_display()
             self._emit_progress()
 
+    def replace_content(self, full_content, skip_ranges=()):
+        """用后台加载完成的全文替换当前片段。字符索引不变，因此画面不会跳动。"""
+        if self.navigator.replace_content(full_content, skip_ranges):
+            self._emit_progress()
+        self.update_display()
+
     def _emit_progress(self):
         self.progress_changed.emit(
             self.settings.get("selected_book", ""),
@@ -131,7 +207,10 @@ class ReaderView(QWidget):
 
     @Slot()
     def toggle_visibility(self):
-        if self.isVisible(): self.hide()
+        if self.isVisible():
+            # 隐藏时暂停自动滚动，之后按空格键继续
+            self.auto_scroller.pause()
+            self.hide()
         else: self.show()
 
     def keyPressEvent(self, event: QKeyEvent):
@@ -152,6 +231,10 @@ class ReaderView(QWidget):
                 self.prev_page()
                 handled = True
 
+        if event.key() == Qt.Key_Space:
+            self.toggle_auto_scroll()
+            handled = True
+
         if handled:
             event.accept()
         else:
@@ -160,9 +243,22 @@ class ReaderView(QWidget):
     def showEvent(self, event: QKeyEvent):
         """窗口显示时，强制刷新尺寸和布局。"""
         super().showEvent(event)
-        # 强制让窗口根据内容调整一次尺寸，这通常能解决初次显示的布局问题
-        self.adjustSize()
-        self.updateGeometry()
+        if not self.auto_fit:
+            # 强制让窗口根据内容调整一次尺寸，这通常能解决初次显示的布局问题
+            self.adjustSize()
+            self.updateGeometry()
+        self.auto_scroller.setGeometry(self.text_label.geometry())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if not self.auto_fit:
+            return
+        self.size_grip.move(self.width() - self.size_grip.width(), self.height() - self.size_grip.height())
+        # 行宽和行数改变后，自动滚动缓冲区中已排版的行不再适用
+        self.stop_auto_scroll()
+        self._apply_pixel_layout()
+        self.update_display()
+        self.overlay_resized.emit(self.width(), self.height())
 
     def mousePressEvent(self, event: QMouseEvent):
         if event.button() == Qt.LeftButton:
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+from PySide6.QtCore import QLockFile, QObject, Signal, Slot
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+# 按用户区分，避免同一台机器上不同用户的实例互相转发
+SERVER_NAME = f"ReadInTheOffice-{os.getenv('USERNAME') or os.getenv('USER') or 'default'}"
+CONNECT_TIMEOUT_MS = 200
+LOCK_FILENAME = "instance.lock"
+
+def send_to_running_instance(args, wait_ms=0):
+    """
+    尝试把启动参数转发给已在运行的实例。
+    转发成功返回True，调用方应立即退出；没有运行中的实例则返回False。
+    wait_ms大于0时，在这段时间内反复尝试连接（另一个实例已经持有锁、但可能还没开始监听）。
+    只使用阻塞接口，因此可以在创建QApplication之前调用。
+    """
+    deadline = time.monotonic() + wait_ms / 1000
+    socket = QLocalSocket()
+    socket.connectToServer(SERVER_NAME)
+    while not socket.waitForConnected(CONNECT_TIMEOUT_MS):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(CONNECT_TIMEOUT_MS / 1000)
+        socket.abort()
+        socket.connectToServer(SERVER_NAME)
+    socket.write((json.dumps(list(args)) + "\n").encode('utf-8'))
+    sent = socket.waitForBytesWritten(CONNECT_TIMEOUT_MS)
+    socket.disconnectFromServer()
+    if socket.state() != QLocalSocket.UnconnectedState:
+        socket.waitForDisconnected(CONNECT_TIMEOUT_MS)
+    return sent
+
+class SingleInstanceServer(QObject):
+    """
+    运行中实例的本地套接字服务端。
+    每个连接发送一行JSON编码的参数列表，解析后通过message_received发出。
+    是否已有实例由配置目录中的锁文件决定：Unix上QLocalServer.listen会用新的套接字文件替换同名的旧文件，
+    即使另一个实例仍在监听也会成功，不能据此判断。
+    """
+    message_received = Signal(list)
+
+    def __init__(self, lock_dir, parent=None):
+        super().__init__(parent)
+        os.makedirs(lock_dir, exist_ok=True)
+        self._lock_file = QLockFile(os.path.join(lock_dir, LOCK_FILENAME))
+        # 锁只在持有它的进程存活期间有效；进程崩溃后由QLockFile按进程号识别并清理
+        self._lock_file.setStaleLockTime(0)
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.UserAccessOption)
+        self._server.newConnection.connect(self._on_new_connection)
+        self._buffers = {}
+
+    def listen(self):
+        """取得实例锁并开始监听；另一个存活的实例持有锁时返回False。"""
+        if not self._lock_file.tryLock(0):
+            return False
+        # 持有锁时不可能有其他实例在监听，同名的套接字文件只能是上次崩溃残留的
+        QLocalServer.removeServer(SERVER_NAME)
+        if self._server.listen(SERVER_NAME):
+            return True
+        self._lock_file.unlock()
+        return False
+
+    def close(self):
+        self._server.close()
+        self._lock_file.unlock()
+
+    @Slot()
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            self._buffers[socket] = b""
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(lambda s=socket: self._on_disconnected(s))
+
+    def _on_ready_read(self, socket):
+        self._buffers[socket] = self._buffers.get(socket, b"") + bytes(socket.readAll())
+        if b"\n" in self._buffers[socket]:
+            line = self._buffers[socket].split(b"\n", 1)[0]
+            self._buffers[socket] = b""
+            self._emit_message(line)
+            socket.disconnectFromServer()
+
+    def _on_disconnected(self, socket):
+        remaining = self._buffers.pop(socket, b"")
+        if remaining.strip():
+            self._emit_message(remaining)
+        socket.deleteLater()
+
+    def _emit_message(self, raw_message):
+        try:
+            args = json.loads(raw_message.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return
+        if isinstance(args, list):
+            self.message_received.emit([str(arg) for arg in args])
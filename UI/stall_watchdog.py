@@ -0,0 +1,151 @@
+import heapq
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+class StallWatchdog(QObject):
+    """
+    主线程卡顿看门狗。
+    后台线程通过排队信号周期性地ping GUI线程，若ping超过阈值仍未被响应，
+    则用 sys._current_frames 抓取主线程调用栈，待主线程恢复后记录卡顿时长。
+    卡顿报告写入配置文件旁的滚动日志；本次运行的卡顿汇总每隔一段时间或每积累一定次数卡顿写入一次，
+    停止时再写入一次，程序崩溃或被强制结束时日志中也有汇总。
+    """
+    ping_signal = Signal(int)
+
+    LOG_MAX_BYTES = 512 * 1024
+    LOG_BACKUP_COUNT = 3
+    WORST_STALL_COUNT = 5
+    TOP_STACK_COUNT = 3
+    SUMMARY_INTERVAL_S = 300 # 有新卡顿时，至少每隔这么久写一次汇总
+    SUMMARY_EVERY_STALLS = 50 # 每积累这么多次卡顿写一次汇总
+
+    def __init__(self, log_path, threshold_ms=50, parent=None):
+        # 必须在主线程中创建，ping信号才会以排队方式投递到主线程执行
+        super().__init__(parent)
+        self.threshold = max(threshold_ms, 1) / 1000
+        self.poll_interval = min(self.threshold / 2, 0.025)
+        self._main_thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._ping_seq = 0
+        self._pending_ping = None # (序号, 发出时间)
+        self._pending_stack = None
+
+        self.stall_count = 0
+        self._worst_stalls = [] # 小顶堆，保存最长的若干次卡顿时长（秒）
+        self._stack_counter = Counter()
+        self._summarized_stall_count = 0 # 上次写汇总时的卡顿次数
+        self._last_summary_time = time.monotonic()
+
+        self._logger = logging.getLogger(f"ReadInTheOffice.stall.{id(self)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._log_handler = RotatingFileHandler(
+            log_path,
+            maxBytes=self.LOG_MAX_BYTES,
+            backupCount=self.LOG_BACKUP_COUNT,
+            encoding='utf-8',
+            delay=True,
+        )
+        self._log_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self._logger.addHandler(self._log_handler)
+
+        self.ping_signal.connect(self._on_ping)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止看门狗线程，并写入本次运行的卡顿汇总。"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=1)
+        self._thread = None
+        self._write_summary()
+        self._logger.removeHandler(self._log_handler)
+        self._log_handler.close()
+
+    def _run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            if time.monotonic() - self._last_summary_time >= self.SUMMARY_INTERVAL_S:
+                self._write_summary()
+            with self._lock:
+                if self._pending_ping is None:
+                    self._ping_seq += 1
+                    self._pending_ping = (self._ping_seq, time.perf_counter())
+                    self._pending_stack = None
+                    seq = self._ping_seq
+                else:
+                    seq = None
+                    elapsed = time.perf_counter() - self._pending_ping[1]
+                    if elapsed >= self.threshold and self._pending_stack is None:
+                        self._pending_stack = self._capture_main_stack()
+            if seq is not None:
+                self.ping_signal.emit(seq)
+
+    def _capture_main_stack(self):
+        frame = sys._current_frames().get(self._main_thread_id)
+        if frame is None:
+            return "<无法获取主线程调用栈>"
+        return "".join(traceback.format_stack(frame))
+
+    @Slot(int)
+    def _on_ping(self, seq):
+        """在主线程中执行；响应越晚说明事件循环被阻塞越久。"""
+        now = time.perf_counter()
+        with self._lock:
+            if self._pending_ping is None or self._pending_ping[0] != seq:
+                return
+            duration = now - self._pending_ping[1]
+            stack = self._pending_stack
+            self._pending_ping = None
+            self._pending_stack = None
+
+        if duration < self.threshold:
+            return
+        # 卡顿过短时看门狗线程可能还没来得及采样
+        stack = stack or "<卡顿期间未能采样调用栈>"
+        self._record_stall(duration, stack)
+
+    def _record_stall(self, duration, stack):
+        # 汇总统计也会被看门狗线程读取，修改时加锁
+        with self._lock:
+            self.stall_count += 1
+            if len(self._worst_stalls) < self.WORST_STALL_COUNT:
+                heapq.heappush(self._worst_stalls, duration)
+            else:
+                heapq.heappushpop(self._worst_stalls, duration)
+            self._stack_counter[stack] += 1
+            summary_due = self.stall_count - self._summarized_stall_count >= self.SUMMARY_EVERY_STALLS
+        self._logger.warning("主线程卡顿 %.1f ms，调用栈：\n%s", duration * 1000, stack)
+        if summary_due:
+            self._write_summary()
+
+    def _write_summary(self):
+        """写入本次运行至今的卡顿汇总；上次汇总之后没有新的卡顿时不写。"""
+        with self._lock:
+            self._last_summary_time = time.monotonic()
+            if self.stall_count == self._summarized_stall_count:
+                return
+            self._summarized_stall_count = self.stall_count
+            worst = ", ".join(f"{d * 1000:.1f}" for d in sorted(self._worst_stalls, reverse=True))
+            lines = [
+                f"卡顿汇总：共 {self.stall_count} 次，阈值 {self.threshold * 1000:.0f} ms",
+                f"最长卡顿（ms）：{worst}",
+            ]
+            for rank, (stack, count) in enumerate(self._stack_counter.most_common(self.TOP_STACK_COUNT), 1):
+                lines.append(f"高频调用栈 #{rank}（{count} 次）：\n{stack}")
+        self._logger.warning("\n".join(lines))
@@ -0,0 +1,334 @@
+import getpass
+import os
+import socket
+import sys
+import time
+from collections import deque
+from threading import Thread
+
+from Backend.chapter_dedup import ChapterDeduplicator
+from Backend.chinese_converter import ChineseConverter, PageConversionCache
+from Backend.config_handler import ConfigHandler
+from Backend.content_filter import ContentFilter
+from Backend.novel_handler import NovelHandler
+from Backend.page_navigator import PageNavigator
+from Backend.reading_progress import ReadingProgress
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import select
+    import termios
+    import tty
+
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+
+class _KeyReader:
+    """
+    把终端切换到原始模式并逐键读取，返回统一的按键名：
+    方向键为"left"/"right"，Esc为"esc"，其余为按键对应的字符（包括Ctrl组合产生的控制字符）。
+    一次读取可能包含多个按键（例如按住方向键不放），全部解析后逐个返回。
+    """
+    def __init__(self):
+        self._pending_keys = deque()
+
+    def __enter__(self):
+        if os.name != 'nt':
+            self._fd = sys.stdin.fileno()
+            self._saved_attrs = termios.tcgetattr(self._fd)
+            tty.setraw(self._fd)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if os.name != 'nt':
+            termios.tcsetattr(self._fd, termios.TCSADRAIN, self._saved_attrs)
+
+    def read_key(self, timeout):
+        """等待至多timeout秒，超时返回None。"""
+        if os.name == 'nt':
+            return self._read_key_windows(timeout)
+        if not self._pending_keys:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+            if not readable:
+                return None
+            self._pending_keys.extend(self._parse_keys(os.read(self._fd, 32)))
+        return self._pending_keys.popleft() if self._pending_keys else None
+
+    def _parse_keys(self, data):
+        keys = []
+        index = 0
+        while index < len(data):
+            byte = data[index]
+            if byte != 0x1b:
+                keys.append(chr(byte))
+                index += 1
+                continue
+            if index + 1 == len(data) or data[index + 1] == 0x1b:
+                keys.append("esc")
+                index += 1
+                continue
+            sequence_end = self._escape_sequence_end(data, index)
+            if sequence_end is not None:
+                # 方向键等功能键：Esc [ 参数 结束字符，或 Esc O 结束字符；不认识的功能键直接忽略
+                final_byte = data[sequence_end - 1]
+                if final_byte == ord('C'):
+                    keys.append("right")
+                elif final_byte == ord('D'):
+                    keys.append("left")
+                index = sequence_end
+            else:
+                keys.append("alt+" + chr(data[index + 1]).lower()) # 终端把Alt组合键编码为Esc前缀
+                index += 2
+        return keys
+
+    def _escape_sequence_end(self, data, index):
+        """data[index]处的Esc开始一个功能键序列时返回序列结束后的位置，否则返回None。"""
+        introducer = data[index + 1]
+        if introducer == ord('O'):
+            return index + 3 if index + 2 < len(data) else None
+        if introducer != ord('['):
+            return None
+        position = index + 2
+        while position < len(data) and 0x30 <= data[position] <= 0x3f:
+            position += 1 # 参数字节
+        if position < len(data) and 0x40 <= data[position] <= 0x7e:
+            return position + 1
+        return None
+
+    def _read_key_windows(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not msvcrt.kbhit():
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.01)
+        key = msvcrt.getwch()
+        if key in ('\x00', '\xe0'):
+            # 功能键由两个字符组成
+            return {'M': "right", 'K': "left"}.get(msvcrt.getwch())
+        if key == '\x1b':
+            return "esc"
+        return key
+
+class TerminalReader:
+    """
+    直接在真实终端中阅读小说的轻量前端，不加载Qt。
+    与图形界面共用NovelHandler、ConfigHandler和阅读进度，两边的进度可以互相接续。
+    老板键会清屏并显示一个伪造的命令行提示符，再按一次老板键回到小说。
+    Ctrl+M、Ctrl+I、Ctrl+J在终端中与回车、Tab、换行无法区分，不能用作快捷键，设置为这些组合时只保留Esc作为老板键。
+    """
+    PROGRESS_AUTOSAVE_INTERVAL_S = 10
+    POLL_INTERVAL_S = 0.2
+
+    def __init__(self, book_name=None):
+        self.config_handler = ConfigHandler()
+        self.app_settings = self.config_handler.load_settings()
+        self.novel_handler = NovelHandler(cache_dir=os.path.join(self.config_handler.config_dir, "cache"))
+        self.novel_handler.set_content_filter(ContentFilter.from_settings(self.app_settings))
+        self.reading_progress = ReadingProgress(self.app_settings, self.novel_handler)
+        self.book_name = book_name or self.app_settings.get("last_selected_book")
+        self.book_sha256 = None
+        self.navigator = None
+        self.page_conversion = None
+        self._full_load_result = None # 后台加载完成后由加载线程写入
+        self._hidden = False
+        self._notice = None # 在第一页下方显示一次的提示
+        self._progress_dirty = False
+        self._last_save_time = time.monotonic()
+
+        self.paging_keys = self._paging_keys(self.app_settings.get("paging_hotkey", "← 和 →"))
+        self.boss_keys = {"esc", self._hotkey_to_key(self.app_settings.get("minimize_hotkey", "<ctrl>+m"))} - {None}
+        self.quit_keys = {"q", "\x03", self._hotkey_to_key(self.app_settings.get("close_hotkey", "<alt>+q"))} - {None}
+
+    def _paging_keys(self, paging_style):
+        if paging_style == "A 和 D":
+            return {"a": "prev", "A": "prev", "d": "next", "D": "next"}
+        return {"left": "prev", "right": "next"}
+
+    def _hotkey_to_key(self, hotkey):
+        """把"<ctrl>+m"形式的快捷键转换成_KeyReader返回的按键名。"""
+        modifier, _, key = hotkey.partition('+')
+        if len(key) != 1:
+            return None
+        if modifier == "<ctrl>" and key.isalpha():
+            if key.lower() in "mij":
+                # 终端发送的是与回车、Tab、换行相同的控制字符
+                return None
+            return chr(ord(key.upper()) - ord('A') + 1)
+        if modifier == "<alt>":
+            return "alt+" + key.lower()
+        return None
+
+    def run(self):
+        if not sys.stdin.isatty() or not sys.stdout.isatty():
+            print("终端阅读器需要在交互式终端中运行。", file=sys.stderr)
+            return 1
+        book_names = self.novel_handler.get_all_books_names()
+        if not book_names:
+            print("books文件夹为空", file=sys.stderr)
+            return 1
+        if self.book_name not in book_names:
+            self.book_name = book_names[0]
+        error_msg = self._open_book()
+        if error_msg:
+            print(error_msg, file=sys.stderr)
+            return 1
+
+        self._enable_ansi_on_windows()
+        try:
+            with _KeyReader() as key_reader:
+                self._render()
+                self._event_loop(key_reader)
+        finally:
+            sys.stdout.write(CLEAR_SCREEN)
+            sys.stdout.flush()
+            self._save_progress()
+        return 0
+
+    def _open_book(self):
+        chars_per_line = self.app_settings.get("chars_per_line", 40)
+        lines_per_page = self.app_settings.get("lines_per_page", 10)
+        converter = ChineseConverter.from_settings(self.app_settings)
+        if converter is not None:
+            self.page_conversion = PageConversionCache(converter)
+        warm_resume = self.reading_progress.try_warm_resume(self.book_name)
+        if warm_resume is not None:
+            # 先显示上次阅读位置附近的片段，全文在后台加载
+            content, content_offset, self.book_sha256, start_char_index = warm_resume
+            self.navigator = PageNavigator(
+                content, chars_per_line, lines_per_page, start_char_index, content_offset
+            )
+            self.navigator.page_transform = self.page_conversion
+            Thread(target=self._load_full_book, daemon=True).start()
+            return None
+
+        content, self.book_sha256, error_msg = self.novel_handler.load_book_with_metadata(self.book_name)
+        if error_msg:
+            return error_msg
+        start_char_index = self.reading_progress.get_start_char_index(
+            self.book_name, self.book_sha256, len(content), chars_per_line * lines_per_page
+        )
+        self._notice = self.reading_progress.position_warning
+        self.navigator = PageNavigator(content, chars_per_line, lines_per_page, start_char_index)
+        self.navigator.page_transform = self.page_conversion
+        if self.page_conversion is not None:
+            Thread(target=self._attach_converted_book, args=(self.book_sha256, content), daemon=True).start()
+        if self.app_settings.get("dedup_chapters", False):
+            # 查重耗时与全文长度成正比，完成后像后台加载的全文一样替换进来
+            Thread(target=self._find_duplicates_in_background, args=(content, self.book_sha256), daemon=True).start()
+        return None
+
+    def _load_full_book(self):
+        result = self.novel_handler.load_book_with_metadata(self.book_name)
+        skip_ranges = self._find_skip_ranges(result[0]) if result[0] is not None else []
+        self._full_load_result = (result, skip_ranges)
+        if result[0] is not None and self.page_conversion is not None:
+            self._attach_converted_book(result[1], result[0])
+
+    def _find_duplicates_in_background(self, content, book_sha256):
+        self._full_load_result = ((content, book_sha256, None), self._find_skip_ranges(content))
+
+    def _attach_converted_book(self, book_sha256, content):
+        persist = self.app_settings.get("persist_chinese_conversion", False)
+        self.page_conversion.attach_book(self.novel_handler, book_sha256, content, persist)
+
+    def _find_skip_ranges(self, content):
+        if not self.app_settings.get("dedup_chapters", False):
+            return []
+        skip_ranges, _ = ChapterDeduplicator().find_duplicates(content)
+        return skip_ranges
+
+    def _event_loop(self, key_reader):
+        while True:
+            key = key_reader.read_key(self.POLL_INTERVAL_S)
+            self._apply_full_load_result()
+            if key is None:
+                self._autosave_progress()
+                continue
+            if key in self.quit_keys:
+                return
+            if self._hidden:
+                # 伪装状态下只有老板键能回到小说，其他按键一律忽略
+                if key in self.boss_keys:
+                    self._hidden = False
+                    self._render()
+            elif key in self.boss_keys:
+                self._hidden = True
+                self._render_fake_prompt()
+            elif self.paging_keys.get(key) == "next":
+                if self.navigator.next_page():
+                    self._on_page_changed()
+            elif self.paging_keys.get(key) == "prev":
+                if self.navigator.prev_page():
+                    self._on_page_changed()
+            self._autosave_progress()
+
+    def _apply_full_load_result(self):
+        if self._full_load_result is None:
+            return
+        (full_content, book_sha256, error_msg), skip_ranges = self._full_load_result
+        self._full_load_result = None
+        if error_msg:
+            # 加载失败时继续使用已显示的片段
+            return
+        self.book_sha256 = book_sha256
+        if self.navigator.replace_content(full_content, skip_ranges):
+            self._on_page_changed()
+
+    def _on_page_changed(self):
+        self.reading_progress.update(self.book_name, self.book_sha256, self.navigator.current_char_index)
+        self._progress_dirty = True
+        if not self._hidden:
+            self._render()
+
+    def _autosave_progress(self):
+        if self._progress_dirty and time.monotonic() - self._last_save_time >= self.PROGRESS_AUTOSAVE_INTERVAL_S:
+            self._save_progress()
+
+    def _save_progress(self):
+        if self.navigator is None:
+            return
+        self.reading_progress.update(self.book_name, self.book_sha256, self.navigator.current_char_index)
+        self.app_settings["last_selected_book"] = self.book_name
+        try:
+            # 图形界面可能同时在运行：在最新的配置文件上只写入这本书的进度，不覆盖其他设置和其他书的进度
+            latest_settings = self.config_handler.load_settings()
+            latest_settings.setdefault("progress", {})[self.book_name] = self.app_settings["progress"][self.book_name]
+            latest_settings["last_selected_book"] = self.book_name
+            self.config_handler.save_settings(latest_settings)
+            self._progress_dirty = False
+        except OSError:
+            pass
+        self._last_save_time = time.monotonic()
+
+    def _render(self):
+        lines = [line.rstrip() for line in self.navigator.page_lines()] or ["(已到末尾)"]
+        if self._notice:
+            lines += ["", self._notice]
+            self._notice = None
+        # 原始模式下换行符不会自动回到行首
+        sys.stdout.write(CLEAR_SCREEN + "\r\n".join(lines))
+        sys.stdout.flush()
+        self.navigator.prefetch()
+
+    def _render_fake_prompt(self):
+        if os.name == 'nt':
+            prompt = f"PS {os.getcwd()}> "
+        else:
+            try:
+                user = getpass.getuser()
+            except Exception:
+                user = "user"
+            prompt = f"{user}@{socket.gethostname()}:~$ "
+        sys.stdout.write(CLEAR_SCREEN + prompt)
+        sys.stdout.flush()
+
+    def _enable_ansi_on_windows(self):
+        """Windows控制台默认不解析ANSI转义序列，需要手动开启虚拟终端处理。"""
+        if os.name != 'nt':
+            return
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11) # STD_OUTPUT_HANDLE
+        mode = ctypes.c_uint32()
+        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            kernel32.SetConsoleMode(handle, mode.value | 0x0004) # ENABLE_VIRTUAL_TERMINAL_PROCESSING
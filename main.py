@@ -4,14 +4,32 @@ import os
 project_root = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(project_root)
 
-from PySide6.QtWidgets import QApplication
-from PySide6.QtGui import QIcon # 新增导入
-import qdarkstyle
-from UI.main_window import MainWindow
+from Backend.config_handler import ConfigHandler
+from UI.single_instance import SingleInstanceServer, send_to_running_instance
+
+FORWARD_WAIT_MS = 3000 # 另一个实例刚刚启动、还没开始监听时，等待它的最长时间
 
 if __name__ == '__main__':
+    # 命令行参数：可选的书名（books目录下的文件名）。
+    # 如果已有实例在运行，把参数转交给它后立即退出，不再冷启动第二个Qt进程。
+    launch_args = sys.argv[1:]
+    if send_to_running_instance(launch_args):
+        sys.exit(0)
+
+    # 以下导入较慢，只有真正需要启动新实例时才执行
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtGui import QIcon # 新增导入
+    import qdarkstyle
+    from UI.main_window import MainWindow
+
     app = QApplication(sys.argv)
-    
+
+    # 两个实例几乎同时启动时，没抢到配置目录中实例锁的一方同样转交参数后退出，不会同时写config.json。
+    # 这里只计算配置目录，不创建ConfigHandler：它会清理临时配置文件，可能干扰正在保存配置的实例
+    instance_server = SingleInstanceServer(os.path.dirname(ConfigHandler.resolve_config_path()))
+    if not instance_server.listen():
+        sys.exit(0 if send_to_running_instance(launch_args, FORWARD_WAIT_MS) else 1)
+
     # 设置应用程序图标
     # 确定打包后的资源基础路径
     if getattr(sys, 'frozen', False):
@@ -31,5 +49,10 @@ if __name__ == '__main__':
         }
     """) # 应用QDarkStyle样式
     window = MainWindow()
+    instance_server.message_received.connect(window.handle_launch_args)
     window.show()
-    sys.exit(app.exec())
+    if launch_args:
+        window.handle_launch_args(launch_args)
+    exit_code = app.exec()
+    instance_server.close()
+    sys.exit(exit_code)
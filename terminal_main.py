@@ -0,0 +1,12 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(project_root)
+
+from UI.terminal_reader import TerminalReader
+
+if __name__ == '__main__':
+    # 不依赖Qt的终端阅读器，可选参数为书名（books目录下的文件名），默认打开上次阅读的书
+    book_name = os.path.basename(sys.argv[1]) if len(sys.argv) > 1 else None
+    sys.exit(TerminalReader(book_name).run())